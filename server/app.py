@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from typing import Optional
 import os
+import json
 import shutil
 import asyncio
 import hashlib
 import pdfplumber
 from utils import predict_clauses as clause_utils
 from utils import summarizer
-from db import db
+from utils import executors
+from utils import jobs
+from utils import budget
+from utils import dedup
+from utils import extractive
+from utils import streams
+from utils import incremental
+from utils import index_gc
+from utils.corpus_index import CorpusIndex, CORPUS_INDEX_ENABLED
+from utils.responses import (
+    FastJSONResponse, SelectiveGZipMiddleware, GZIP_MINIMUM_SIZE, make_etag, etag_matches,
+)
+from utils.llm_cache import SummaryCache, LLM_CACHE_ENABLED
+from db import db, ensure_indexes as ensure_db_indexes, index_report, migrate_clause_cache
 
 # RAG is optional - import only if available
 try:
@@ -23,6 +38,7 @@ except ImportError as e:
     rag = None
 import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 app = FastAPI(title="Legal Clause Classifier API")
 
@@ -38,7 +54,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+
+@app.exception_handler(executors.ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: executors.ExecutorSaturated):
+    """
+    Interactive work rejected by a full executor queue is a 429, wherever
+    it was submitted (endpoints with a more specific message catch it first).
+    """
+    return FastJSONResponse(
+        {"detail": "Server is busy, please retry shortly"},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Mount static directories for client uploads + PDF.js
 app.mount("/uploads", StaticFiles(directory="../client/uploads"), name="uploads")
@@ -53,10 +84,127 @@ def load_model_once():
     model_loaded = True
     print("LegalBERT model loaded and ready for inference")
 
+
+@app.on_event("startup")
+def configure_executors():
+    executors.configure_torch_threads()
+
+
+llm_health_task = None
+
+
+@app.on_event("startup")
+async def start_llm_health_checks():
+    global llm_health_task
+    llm_health_task = asyncio.create_task(summarizer.llm_pool.run_health_checks())
+
+
+occurrence_backfill_task = None
+
+
+@app.on_event("startup")
+async def provision_db_indexes():
+    global occurrence_backfill_task
+    try:
+        await migrate_clause_cache(clause_utils.CLAUSE_MODEL_VERSION)
+    except Exception as exc:
+        print(f"⚠️ clause_cache migration failed: {exc}")
+    await ensure_db_indexes()
+    occurrence_backfill_task = asyncio.create_task(backfill_clause_occurrences())
+
+
+@app.on_event("startup")
+async def configure_summary_cache():
+    if not LLM_CACHE_ENABLED:
+        print("ℹ️ LLM summary cache disabled")
+        return
+    cache = SummaryCache(db["llm_cache"])
+    try:
+        await cache.ensure_indexes()
+    except Exception as exc:
+        print(f"⚠️ Could not create llm_cache TTL index: {exc}")
+    summarizer.configure_cache(cache)
+    print("LLM summary cache ready")
+
+
+index_janitor = index_gc.IndexJanitor(rag, db["rag_indexes"]) if RAG_AVAILABLE and rag else None
+rag_gc_task = None
+
+
+@app.on_event("startup")
+async def start_rag_gc():
+    global rag_gc_task
+    if index_janitor is not None and rag.PERSISTENT:
+        rag_gc_task = asyncio.create_task(index_janitor.run_forever())
+
+
+corpus_index = None
+
+
+@app.on_event("startup")
+async def open_corpus_index():
+    global corpus_index
+    if not (CORPUS_INDEX_ENABLED and RAG_AVAILABLE and rag):
+        print("ℹ️ Cross-document corpus index disabled")
+        return
+    try:
+        corpus_index = await executors.embedding_executor.run(
+            lambda: CorpusIndex(embeddings=rag.embedding_function)
+        )
+        print(f"Corpus index ready ({corpus_index.size} clauses)")
+    except Exception as exc:
+        print(f"⚠️ Could not open corpus index: {exc}")
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executors.shutdown_all()
+
+
+@app.on_event("shutdown")
+async def stop_llm_health_checks():
+    if llm_health_task is not None:
+        llm_health_task.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_occurrence_backfill():
+    if occurrence_backfill_task is not None:
+        occurrence_backfill_task.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_rag_gc():
+    if rag_gc_task is not None:
+        rag_gc_task.cancel()
+
 class PDFRequest(BaseModel):
     pdf_path: str
 
 
+class SummaryStartRequest(BaseModel):
+    pdf_path: str
+    # job_id of a previous version: unchanged clauses are carried forward
+    based_on: Optional[str] = None
+
+
+class ClauseSearchRequest(BaseModel):
+    query: str
+    category: Optional[str] = None
+    k: int = 10
+
+
+async def update_job(filter_: dict, update: dict, **kwargs):
+    """
+    update_one on `summaries` that bumps the job's `version` and
+    `updated_at`, which GET /summaries/{job_id} uses as its ETag.
+    """
+    update = dict(update)
+    update["$set"] = {**update.get("$set", {}), "updated_at": datetime.datetime.utcnow()}
+    update["$inc"] = {**update.get("$inc", {}), "version": 1}
+    return await db["summaries"].update_one(filter_, update, **kwargs)
+
+
 def compute_file_hash(path: str) -> str:
     """Return a stable SHA256 hash of the file contents."""
     sha = hashlib.sha256()
@@ -66,24 +214,121 @@ def compute_file_hash(path: str) -> str:
     return sha.hexdigest()
 
 
-async def get_cached_clauses(pdf_path: str):
-    file_hash = compute_file_hash(pdf_path)
-    cached = await db["clause_cache"].find_one({"file_hash": file_hash})
-    return cached["predicted_clauses"] if cached else None, file_hash
+async def get_cached_clauses(pdf_path: str, job_id: str = None):
+    file_hash = await executors.pdf_executor.run(
+        compute_file_hash, pdf_path, priority=executors.BATCH, job_id=job_id
+    )
+    return await find_cached_clauses(file_hash), file_hash
 
 
-async def cache_clauses(file_hash: str, clauses: list, pdf_path: str):
-    await db["clause_cache"].update_one(
-        {"file_hash": file_hash},
-        {
-            "$set": {
-                "predicted_clauses": clauses,
-                "pdf_path": pdf_path,
-                "updated_at": datetime.datetime.utcnow(),
-            }
+# Cache hits refresh last_used_at (which the TTL index keys on) at most this often
+CACHE_TOUCH_INTERVAL = datetime.timedelta(hours=1)
+
+
+async def find_cached_clauses(file_hash: str):
+    cached = await db["clause_cache"].find_one(
+        {"file_hash": file_hash, "model_version": clause_utils.CLAUSE_MODEL_VERSION},
+        {"predicted_clauses": 1, "last_used_at": 1},
+    )
+    if not cached:
+        return None
+    now = datetime.datetime.utcnow()
+    last_used = cached.get("last_used_at")
+    if last_used is None or now - last_used > CACHE_TOUCH_INTERVAL:
+        await db["clause_cache"].update_one(
+            {"_id": cached["_id"]}, {"$set": {"last_used_at": now}}
+        )
+    return cached["predicted_clauses"]
+
+
+async def cache_clauses(file_hash: str, clauses: list, pdf_path: str, other_hashes: list = None):
+    """
+    Store clause predictions once per (file hash, classifier version).
+    Identical results already stored are not rewritten. `other_hashes`
+    (segments classified "Other") lets later versions skip them.
+    """
+    results_hash = hashlib.sha256(
+        json.dumps(clauses, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    now = datetime.datetime.utcnow()
+    key = {"file_hash": file_hash, "model_version": clause_utils.CLAUSE_MODEL_VERSION}
+    extra = {"other_hashes": other_hashes} if other_hashes is not None else {}
+    # Compare before writing: the unique (file_hash, model_version) index may
+    # be missing, so an upsert cannot be relied on to refuse a duplicate.
+    existing = await db["clause_cache"].find_one(key, {"results_hash": 1})
+    if existing is not None and existing.get("results_hash") == results_hash:
+        await db["clause_cache"].update_one(
+            {"_id": existing["_id"]}, {"$set": {"last_used_at": now, **extra}}
+        )
+        return
+
+    update = {
+        "$set": {
+            "predicted_clauses": clauses,
+            "results_hash": results_hash,
+            "pdf_path": pdf_path,
+            "updated_at": now,
+            "last_used_at": now,
+            **extra,
         },
-        upsert=True,
+        "$setOnInsert": {"created_at": now},
+    }
+    try:
+        result = await db["clause_cache"].update_one(
+            {"_id": existing["_id"]} if existing is not None else key,
+            update,
+            upsert=existing is None,
+        )
+    except DuplicateKeyError:
+        # A concurrent job inserted the entry first; overwrite it instead
+        result = await db["clause_cache"].update_one(key, update)
+    if result.upserted_id is not None or result.modified_count:
+        await index_clause_occurrences(file_hash, clauses)
+
+
+async def index_clause_occurrences(file_hash: str, clauses: list):
+    """
+    Replace the flattened (file hash, category, clause number, offsets) rows
+    for one document, so category queries never unwind clause arrays.
+    """
+    model_version = clause_utils.CLAUSE_MODEL_VERSION
+    try:
+        await db["clause_occurrences"].delete_many(
+            {"file_hash": file_hash, "model_version": model_version}
+        )
+        occurrences = [
+            {
+                "file_hash": file_hash,
+                "model_version": model_version,
+                "category": clause.get("category"),
+                "clause_no": clause.get("clause_no"),
+                "start": clause.get("start"),
+                "end": clause.get("end"),
+            }
+            for clause in clauses
+        ]
+        if occurrences:
+            await db["clause_occurrences"].insert_many(occurrences, ordered=False)
+        await db["clause_cache"].update_one(
+            {"file_hash": file_hash, "model_version": model_version},
+            {"$set": {"occurrences_indexed": True}},
+        )
+    except Exception as exc:
+        print(f"⚠️ Could not index clause occurrences for {file_hash}: {exc}")
+
+
+async def backfill_clause_occurrences():
+    """Index occurrences for clause results stored before the collection existed."""
+    indexed = 0
+    cursor = db["clause_cache"].find(
+        {"model_version": clause_utils.CLAUSE_MODEL_VERSION, "occurrences_indexed": {"$ne": True}},
+        {"file_hash": 1, "predicted_clauses": 1},
     )
+    async for entry in cursor:
+        await index_clause_occurrences(entry["file_hash"], entry.get("predicted_clauses") or [])
+        indexed += 1
+    if indexed:
+        print(f"🗂️ Backfilled clause occurrences for {indexed} documents")
 
 
 def extract_full_text(pdf_path: str) -> str:
@@ -120,108 +365,378 @@ def extract_full_text(pdf_path: str) -> str:
         return ""
 
 
-async def run_summarization_job(job_id: str, pdf_path: str):
+async def ensure_not_cancelled(job_id: str):
+    """
+    Cooperative cancellation point between pipeline stages.
+    Also honours cancellations recorded by another worker process.
+    """
+    if jobs.is_cancel_requested(job_id):
+        raise jobs.JobCancelled(job_id)
+    job = await db["summaries"].find_one({"_id": ObjectId(job_id)}, {"status": 1})
+    if job and job.get("status") == "CANCELLED":
+        raise jobs.JobCancelled(job_id)
+
+
+async def release_rag_index(job_id: str):
+    """
+    Drop the job's hold on its RAG index. In-memory indexes only live as
+    long as the jobs that use them; persistent ones follow RAG_RETENTION.
+    """
+    if index_janitor is not None:
+        await index_janitor.on_released(rag.release(job_id))
+
+
+def compute_job_status(failure_count: int, total: int) -> str:
+    if failure_count == 0:
+        return "COMPLETED"
+    if failure_count == total:
+        return "FAILED"
+    return "PARTIAL_FAILURE"
+
+
+def build_clause_summary(
+    clause: dict, idx: int, summary_text: str, failed: bool, duplicate_of: int = None
+) -> dict:
+    summary = {
+        "clause_no": clause.get("clause_no", idx + 1),
+        "category": clause.get("category", "Unknown"),
+        "original_text": clause.get("clause", ""),
+        "summary_text": summary_text,
+        "is_failed": bool(failed),
+        "model_version": summarizer.MODEL_VERSION,
+        "prompt_version": summarizer.PROMPT_VERSION,
+    }
+    if duplicate_of is not None:
+        summary["duplicate_of"] = duplicate_of
+    return summary
+
+
+def find_duplicate_clauses(clauses: list) -> list:
+    """
+    Representative index for every clause: exact duplicates (same normalized
+    text) share one representative, which is the only one summarized and
+    embedded. Near-duplicates are summarized individually; a changed
+    amount or party would otherwise inherit another clause's summary.
+    """
+    if not dedup.DEDUP_ENABLED:
+        return list(range(len(clauses)))
+    return dedup.find_duplicates([clause.get("clause", "") for clause in clauses], near=False)
+
+
+async def precompute_related(job_id: str, index_key: str, indexed: list, priority: int) -> dict:
+    """
+    RAG neighbours for every indexed clause in one batched similarity pass.
+    `indexed` lists the clause indices in the order they were indexed.
+    Returns {idx: [Document]}, or None if neighbours could not be computed
+    (summarization then falls back to per-clause retriever lookups).
+    """
+    try:
+        neighbors = await executors.embedding_executor.run(
+            rag.precompute_neighbors, index_key, priority=priority, job_id=job_id
+        )
+    except Exception as neighbor_error:
+        print(f"⚠️ Neighbour precomputation failed (falling back to retriever): {neighbor_error}")
+        return None
+    if len(neighbors) != len(indexed):
+        print(f"⚠️ RAG index has {len(neighbors)} clauses, expected {len(indexed)}; using retriever")
+        return None
+    return dict(zip(indexed, neighbors))
+
+
+async def summarize_clauses(
+    job_id: str, clauses: list, retriever, indices: list = None, lane: str = budget.LANE_STANDARD,
+    related: dict = None,
+) -> dict:
+    """
+    Summarize clauses[idx] for every idx in `indices` (all clauses by default)
+    using sliding window context + RAG, CLAUSE_BATCH_SIZE calls at a time
+    (LOW_LANE_CLAUSE_BATCH_SIZE for oversized documents). In batched mode
+    each call covers several clauses. `related` holds precomputed RAG
+    neighbours by clause index (see precompute_related).
+    Returns {idx: (summary_text, failed)}.
+    """
+    if indices is None:
+        indices = list(range(len(clauses)))
+    if lane == budget.LANE_LOW:
+        batch_size = int(os.getenv("LOW_LANE_CLAUSE_BATCH_SIZE", "1"))
+    else:
+        batch_size = int(os.getenv("CLAUSE_BATCH_SIZE", "5"))
+    batch_size *= summarizer.clauses_per_call()
+
+    results = {}
+    for start in range(0, len(indices), batch_size):
+        await ensure_not_cancelled(job_id)
+        batch = indices[start : start + batch_size]
+        items = [
+            {
+                "clause_no": clauses[idx].get("clause_no", idx + 1),
+                "target_text": clauses[idx].get("clause", ""),
+                "prev_text": clauses[idx - 1]["clause"] if idx > 0 else "",
+                "next_text": clauses[idx + 1]["clause"] if idx < len(clauses) - 1 else "",
+                "related_docs": related.get(idx) if related is not None else None,
+            }
+            for idx in batch
+        ]
+        results.update(zip(batch, await summarizer.generate_clause_summaries(items, retriever)))
+    return results
+
+
+async def persist_partial_summary(job_object_id: ObjectId, stream: "streams.SummaryStream"):
+    """
+    Periodically save the streamed executive summary so a client that
+    reconnects to another worker (or after a restart) can continue from it.
+    """
+    interval = float(os.getenv("STREAM_PERSIST_INTERVAL", "2"))
+    saved = (None, None)
+    while True:
+        await asyncio.sleep(interval)
+        current = (stream.generation, len(stream.text))
+        if current != saved and stream.text:
+            await update_job(
+                {"_id": job_object_id, "status": "PROCESSING"},
+                {"$set": {"document_summary_partial": stream.text}},
+            )
+            saved = current
+
+
+# Oversized documents run one (or LOW_LANE_CONCURRENCY) at a time
+low_lane_slots = asyncio.Semaphore(int(os.getenv("LOW_LANE_CONCURRENCY", "1")))
+
+
+async def run_summarization_job(job_id: str, pdf_path: str, lane: str = budget.LANE_STANDARD,
+                                based_on: str = None):
     """
     Asynchronously run clause-level + document-level summarization.
+    Low-lane (oversized) documents wait for a low-lane slot first.
+    """
+    try:
+        if lane == budget.LANE_LOW:
+            async with low_lane_slots:
+                await _run_summarization_job(job_id, pdf_path, lane, based_on)
+        else:
+            await _run_summarization_job(job_id, pdf_path, lane, based_on)
+    finally:
+        budget.release(job_id)
+        await release_rag_index(job_id)
+
+
+async def _run_summarization_job(job_id: str, pdf_path: str, lane: str, based_on: str = None):
+    """
     Uses sliding window context (previous + next clause) + RAG for enhanced context.
     RAG retrieves semantically relevant clauses from across the document.
+    Wall time per stage and the memory high-water mark are stored under `metrics`.
+    With `based_on` (a previous version's job), clauses are aligned to that
+    job; only inserted/modified clauses are classified and summarized.
     """
     job_object_id = ObjectId(job_id)
     start_time = datetime.datetime.utcnow()
+    doc_summary_task = None
+    provisional_task = None
+    recorder = budget.StageRecorder()
+    priority = executors.BACKGROUND if lane == budget.LANE_LOW else executors.BATCH
+    llm_usage = summarizer.start_usage_tracking()
+    unique_indices = []
+    summary_indices = []
+    carried = {}
+    classified = None
+
+    def job_metrics() -> dict:
+        return {
+            **recorder.as_dict(),
+            "llm_usage": llm_usage,
+            "clause_summary_mode": summarizer.CLAUSE_SUMMARY_MODE,
+            "unique_clauses": len(unique_indices),
+            "clauses_summarized": len(summary_indices),
+            "clauses_carried_forward": len(carried),
+            "clauses_classified": classified,
+        }
 
     try:
-        await db["summaries"].update_one(
-            {"_id": job_object_id},
+        await update_job(
+            {"_id": job_object_id, "status": "PENDING"},
             {"$set": {"status": "PROCESSING", "started_at": start_time}},
         )
+        await ensure_not_cancelled(job_id)
 
-        loop = asyncio.get_running_loop()
-        cached_clauses, file_hash = await get_cached_clauses(pdf_path)
-        if cached_clauses:
-            print("✅ Using cached clause predictions")
-            clauses = cached_clauses
-        else:
-            clauses = await loop.run_in_executor(None, clause_utils.predict_clauses, pdf_path)
-            await cache_clauses(file_hash, clauses, pdf_path)
+        async def extract_and_summarize_provisionally():
+            """Full text + extractive summary, shown before the slow clause stages finish."""
+            with recorder.stage("text_extraction"):
+                text = await executors.pdf_executor.run(
+                    extract_full_text, pdf_path, priority=priority, job_id=job_id
+                )
+            with recorder.stage("extractive_summary"):
+                summary = await executors.pdf_executor.run(
+                    extractive.summarize, text or "", priority=priority, job_id=job_id
+                )
+            if summary:
+                await update_job(
+                    {"_id": job_object_id, "status": {"$ne": "CANCELLED"}},
+                    {
+                        "$set": {
+                            "document_summary": summary,
+                            "document_summary_source": "extractive",
+                        }
+                    },
+                )
+            return text, summary
+
+        # Runs alongside clause prediction, dedup and RAG indexing
+        provisional_task = asyncio.create_task(extract_and_summarize_provisionally())
+
+        previous = None
+        if based_on:
+            previous = await db["summaries"].find_one(
+                {"_id": ObjectId(based_on)}, {"clause_summaries": 1, "file_hash": 1}
+            )
+
+        with recorder.stage("clause_prediction"):
+            cached_clauses, file_hash = await get_cached_clauses(pdf_path, job_id)
+            await update_job(
+                {"_id": job_object_id}, {"$set": {"file_hash": file_hash}}
+            )
+            if cached_clauses:
+                print("✅ Using cached clause predictions")
+                clauses = cached_clauses
+            else:
+                known = {}
+                if previous:
+                    previous_cache = await db["clause_cache"].find_one(
+                        {"file_hash": previous.get("file_hash"),
+                         "model_version": clause_utils.CLAUSE_MODEL_VERSION},
+                        {"other_hashes": 1},
+                    )
+                    known = incremental.known_categories(
+                        previous.get("clause_summaries") or [],
+                        (previous_cache or {}).get("other_hashes"),
+                    )
+                clauses, other_hashes, classified = await executors.inference_executor.run(
+                    clause_utils.predict_clauses_incremental, pdf_path, known,
+                    priority=priority, job_id=job_id,
+                )
+                await cache_clauses(file_hash, clauses, pdf_path, other_hashes)
+        await ensure_not_cancelled(job_id)
 
         if not clauses:
-            await db["summaries"].update_one(
+            await jobs.cancel_tasks(provisional_task)
+            await update_job(
                 {"_id": job_object_id},
                 {
                     "$set": {
                         "status": "FAILED",
                         "error": "No clauses available for summarization",
+                        "metrics": job_metrics(),
                         "completed_at": datetime.datetime.utcnow(),
-                    }
+                    },
+                    "$unset": {"document_summary_partial": ""},
                 },
             )
             return
 
+        # Dedup: summarize/embed one representative per exact-duplicate group
+        with recorder.stage("dedup"):
+            representatives = await executors.pdf_executor.run(
+                find_duplicate_clauses, clauses, priority=priority, job_id=job_id
+            )
+        unique_indices = sorted(set(representatives))
+        unique_clauses = [clauses[idx] for idx in unique_indices]
+        if len(unique_indices) < len(clauses):
+            print(f"🧹 Dedup: {len(clauses)} clauses -> {len(unique_indices)} unique")
+
+        # Amended version: carry forward summaries of unchanged clauses
+        if previous:
+            previous_summaries = previous.get("clause_summaries") or []
+            unchanged, change_map = incremental.align(previous_summaries, clauses)
+            carried = {
+                idx: previous_summaries[old_idx]
+                for idx, old_idx in unchanged.items()
+                if not previous_summaries[old_idx].get("is_failed")
+                and previous_summaries[old_idx].get("model_version") == summarizer.MODEL_VERSION
+                and previous_summaries[old_idx].get("prompt_version") == summarizer.PROMPT_VERSION
+            }
+            change_counts = incremental.change_counts(change_map)
+            print(f"🔀 Based on {based_on}: {change_counts}, {len(carried)} summaries carried forward")
+            await update_job(
+                {"_id": job_object_id},
+                {"$set": {"change_map": change_map, "change_counts": change_counts}},
+            )
+        summary_indices = [idx for idx in unique_indices if idx not in carried]
+
         # RAG: Index the document for semantic search (optional)
         retriever = None
+        related = None
         if RAG_AVAILABLE and rag:
-            print(f"📚 Indexing {len(clauses)} clauses into vector database...")
+            print(f"📚 Indexing {len(unique_clauses)} clauses into vector database...")
             try:
-                await loop.run_in_executor(None, rag.index_document, job_id, clauses)
-                retriever = await loop.run_in_executor(None, rag.get_retriever, job_id)
+                # Keyed by content: jobs over the same PDF share the index
+                with recorder.stage("rag_index"):
+                    await executors.embedding_executor.run(
+                        rag.index_document, file_hash, unique_clauses, job_id, unique_indices,
+                        priority=priority, job_id=job_id,
+                    )
+                    await index_janitor.touch(file_hash)
+                    retriever = await executors.embedding_executor.run(
+                        rag.get_retriever, file_hash, priority=priority, job_id=job_id
+                    )
+                    related = await precompute_related(job_id, file_hash, unique_indices, priority)
                 print(f"✅ RAG indexing complete. Retriever ready.")
             except Exception as rag_error:
                 print(f"⚠️ RAG indexing failed (will continue without RAG): {rag_error}")
                 retriever = None
         else:
             print("ℹ️ RAG not available, using sliding window context only.")
+        await ensure_not_cancelled(job_id)
 
-        # Extract full document text early and start Map-Reduce summarization in parallel
-        print("📄 Extracting full document text for general summarization...")
-        full_doc_text = await loop.run_in_executor(None, extract_full_text, pdf_path)
-        
+        # Full document text (extracted at the start) feeds Map-Reduce summarization
+        full_doc_text, provisional_summary = await provisional_task
         if not full_doc_text or len(full_doc_text.strip()) < 50:
             print(f"⚠️ Warning: Extracted text is empty or too short ({len(full_doc_text) if full_doc_text else 0} chars)")
             # Still try to generate summary, but log the issue
         else:
             print(f"✅ Extracted {len(full_doc_text)} characters from PDF")
-        
-        doc_summary_task = asyncio.create_task(
-            summarizer.generate_general_summary_map_reduce(full_doc_text)
-        )
+        await ensure_not_cancelled(job_id)
 
-        clause_summaries = []
-        failure_count = 0
-        batch_size = int(os.getenv("CLAUSE_BATCH_SIZE", "5"))
+        summary_stream = streams.open_stream(job_id)
 
-        async def summarize_batch(batch_start: int, batch: list):
-            results = []
-            for local_idx, clause in enumerate(batch):
-                idx = batch_start + local_idx
-                current_text = clause.get("clause", "")
-                prev_text = clauses[idx - 1]["clause"] if idx > 0 else ""
-                next_text = clauses[idx + 1]["clause"] if idx < len(clauses) - 1 else ""
-                results.append(
-                    summarizer.generate_clause_summary(
-                        current_text, prev_text, next_text, retriever
-                    )
+        async def timed_document_summary():
+            with recorder.stage("document_summary"):
+                persist_task = asyncio.create_task(
+                    persist_partial_summary(job_object_id, summary_stream)
                 )
-            return await asyncio.gather(*results)
+                try:
+                    result = await summarizer.generate_general_summary_map_reduce(
+                        full_doc_text,
+                        fallback_summary=provisional_summary or None,
+                        token_sink=summary_stream,
+                    )
+                finally:
+                    await jobs.cancel_tasks(persist_task)
+                # Readers get the final text now, not when clause summaries finish
+                streams.close_stream(job_id, result)
+                return result
 
-        summaries_results = []
-        for start in range(0, len(clauses), batch_size):
-            batch = clauses[start : start + batch_size]
-            summaries_results.extend(await summarize_batch(start, batch))
+        doc_summary_task = asyncio.create_task(timed_document_summary())
 
-        for idx, (summary_text, failed) in enumerate(summaries_results):
-            failure_count += 1 if failed else 0
-            clause = clauses[idx]
-            clause_summaries.append(
-                {
-                    "clause_no": clause.get("clause_no", idx + 1),
-                    "category": clause.get("category", "Unknown"),
-                    "original_text": clause.get("clause", ""),
-                    "summary_text": summary_text,
-                    "is_failed": bool(failed),
-                    "model_version": summarizer.MODEL_VERSION,
-                    "prompt_version": summarizer.PROMPT_VERSION,
-                }
+        with recorder.stage("clause_summaries"):
+            summaries_results = await summarize_clauses(
+                job_id, clauses, retriever, summary_indices, lane=lane, related=related
+            )
+        for idx, item in carried.items():
+            summaries_results[idx] = (item.get("summary_text", ""), False)
+        # Fan each representative's result out to its duplicates
+        clause_summaries = [
+            build_clause_summary(
+                clauses[idx],
+                idx,
+                *(summaries_results[idx] if idx in carried else summaries_results[representatives[idx]]),
+                duplicate_of=(
+                    clauses[representatives[idx]].get("clause_no", representatives[idx] + 1)
+                    if representatives[idx] != idx
+                    else None
+                ),
             )
+            for idx in range(len(clauses))
+        ]
+        failure_count = sum(1 for item in clause_summaries if item["is_failed"])
 
         # Wait for Map-Reduce document summary (running in parallel with clause summarization)
         try:
@@ -230,43 +745,230 @@ async def run_summarization_job(job_id: str, pdf_path: str):
             print(f"❌ Error waiting for document summary task: {doc_summary_error}")
             import traceback
             traceback.print_exc()
-            document_summary = f"Executive summary unavailable: {str(doc_summary_error)}"
+            document_summary = (
+                provisional_summary
+                or f"Executive summary unavailable: {str(doc_summary_error)}"
+            )
+            streams.close_stream(job_id, document_summary)
+        document_summary_source = (
+            "extractive" if provisional_summary and document_summary == provisional_summary else "llm"
+        )
 
-        if failure_count == 0:
-            status = "COMPLETED"
-        elif failure_count == len(clause_summaries):
-            status = "FAILED"
-        else:
-            status = "PARTIAL_FAILURE"
+        status = compute_job_status(failure_count, len(clause_summaries))
 
-        await db["summaries"].update_one(
-            {"_id": job_object_id},
+        await ensure_not_cancelled(job_id)
+        await update_job(
+            {"_id": job_object_id, "status": {"$ne": "CANCELLED"}},
             {
                 "$set": {
                     "status": status,
                     "clause_summaries": clause_summaries,
                     "document_summary": document_summary,
+                    "document_summary_source": document_summary_source,
                     "model_version": summarizer.MODEL_VERSION,
                     "prompt_version": summarizer.PROMPT_VERSION,
                     "failure_count": failure_count,
                     "total_clauses": len(clause_summaries),
+                    "metrics": job_metrics(),
                     "completed_at": datetime.datetime.utcnow(),
-                }
+                },
+                # The streamed draft is superseded by document_summary
+                "$unset": {"document_summary_partial": ""},
             },
         )
+        print(f"⏱️ Job {job_id} stages: {recorder.stages} (peak RSS {recorder.peak_rss_mb} MB)")
 
-    except Exception as exc:
-        await db["summaries"].update_one(
+        # Make the document's clauses searchable across the corpus
+        if corpus_index is not None:
+            try:
+                added = await executors.embedding_executor.run(
+                    corpus_index.add_document, file_hash, job_id, unique_clauses,
+                    priority=executors.BACKGROUND, job_id=job_id,
+                )
+                if added:
+                    print(f"🗂️ Added {added} clauses to the corpus index")
+            except Exception as corpus_error:
+                print(f"⚠️ Could not add job {job_id} to the corpus index: {corpus_error}")
+
+    except (asyncio.CancelledError, jobs.JobCancelled):
+        print(f"🛑 Summarization job {job_id} cancelled")
+        await jobs.cancel_tasks(doc_summary_task, provisional_task)
+        streams.close_stream(job_id)
+        await update_job(
             {"_id": job_object_id},
+            {
+                "$set": {
+                    "status": "CANCELLED",
+                    "metrics": job_metrics(),
+                    "completed_at": datetime.datetime.utcnow(),
+                },
+                "$unset": {"document_summary_partial": ""},
+            },
+        )
+
+    except Exception as exc:
+        await jobs.cancel_tasks(doc_summary_task, provisional_task)
+        streams.close_stream(job_id)
+        await update_job(
+            {"_id": job_object_id, "status": {"$ne": "CANCELLED"}},
             {
                 "$set": {
                     "status": "FAILED",
                     "error": str(exc),
+                    "metrics": job_metrics(),
+                    "completed_at": datetime.datetime.utcnow(),
+                },
+                "$unset": {"document_summary_partial": ""},
+            },
+        )
+
+async def run_retry_job(job_id: str, previous_status: str, lane: str = budget.LANE_STANDARD,
+                        budget_key: str = None):
+    """
+    Retry a job's failed clauses in its admission lane; like a new job,
+    low-lane (oversized) documents wait for a low-lane slot first.
+    `budget_key` is the reservation made when the retry was admitted.
+    """
+    try:
+        if lane == budget.LANE_LOW:
+            async with low_lane_slots:
+                await _run_retry_job(job_id, previous_status, lane)
+        else:
+            await _run_retry_job(job_id, previous_status, lane)
+    finally:
+        budget.release(budget_key or job_id)
+
+
+async def _run_retry_job(job_id: str, previous_status: str, lane: str):
+    """
+    Re-run only the clauses of a job marked `is_failed`, reusing its clause
+    list, RAG index and document summary, and update the job in place.
+    """
+    job_object_id = ObjectId(job_id)
+    priority = executors.BACKGROUND if lane == budget.LANE_LOW else executors.BATCH
+
+    try:
+        job = await db["summaries"].find_one({"_id": job_object_id})
+        clause_summaries = job.get("clause_summaries") or []
+        clauses = [
+            {
+                "clause_no": item.get("clause_no", idx + 1),
+                "category": item.get("category", "Unknown"),
+                "clause": item.get("original_text", ""),
+            }
+            for idx, item in enumerate(clause_summaries)
+        ]
+        failed_indices = [
+            idx for idx, item in enumerate(clause_summaries) if item.get("is_failed")
+        ]
+        representatives = await executors.pdf_executor.run(
+            find_duplicate_clauses, clauses, priority=priority, job_id=job_id
+        )
+        retry_indices = sorted({representatives[idx] for idx in failed_indices})
+        print(f"🔁 Retrying {len(failed_indices)}/{len(clauses)} failed clauses "
+              f"({len(retry_indices)} unique) for job {job_id}")
+
+        retriever = None
+        related = None
+        if RAG_AVAILABLE and rag:
+            try:
+                # Reuses the job's index (or another job's over the same file)
+                index_key = job.get("file_hash") or job_id
+                await executors.embedding_executor.run(
+                    rag.index_document, index_key,
+                    [clauses[idx] for idx in sorted(set(representatives))], job_id,
+                    sorted(set(representatives)),
+                    priority=priority, job_id=job_id,
+                )
+                await index_janitor.touch(index_key)
+                retriever = await executors.embedding_executor.run(
+                    rag.get_retriever, index_key, priority=priority, job_id=job_id
+                )
+                related = await precompute_related(
+                    job_id, index_key, sorted(set(representatives)), priority
+                )
+            except Exception as rag_error:
+                print(f"⚠️ RAG unavailable for retry (will continue without RAG): {rag_error}")
+                retriever = None
+
+        results = await summarize_clauses(
+            job_id, clauses, retriever, retry_indices, lane=lane, related=related
+        )
+
+        updates = {}
+        still_failed = 0
+        for idx in failed_indices:
+            rep_idx = representatives[idx]
+            summary_text, failed = results[rep_idx]
+            still_failed += 1 if failed else 0
+            updates[f"clause_summaries.{idx}"] = build_clause_summary(
+                clauses[idx], idx, summary_text, failed,
+                duplicate_of=clauses[rep_idx]["clause_no"] if rep_idx != idx else None,
+            )
+        updates.update(
+            {
+                "status": compute_job_status(still_failed, len(clause_summaries)),
+                "failure_count": still_failed,
+                "completed_at": datetime.datetime.utcnow(),
+            }
+        )
+
+        await ensure_not_cancelled(job_id)
+        await update_job(
+            {"_id": job_object_id, "status": {"$ne": "CANCELLED"}},
+            # An error from the failed run (or an earlier retry) no longer applies
+            {"$set": updates, "$unset": {"error": ""}},
+        )
+        print(f"✅ Retry finished for job {job_id}: {still_failed} clauses still failing")
+
+    except (asyncio.CancelledError, jobs.JobCancelled):
+        print(f"🛑 Retry of job {job_id} cancelled")
+        await update_job(
+            {"_id": job_object_id},
+            {"$set": {"status": "CANCELLED", "completed_at": datetime.datetime.utcnow()}},
+        )
+
+    except Exception as exc:
+        await update_job(
+            {"_id": job_object_id, "status": {"$ne": "CANCELLED"}},
+            {
+                "$set": {
+                    "status": previous_status,
+                    "error": f"Retry failed: {exc}",
                     "completed_at": datetime.datetime.utcnow(),
                 }
             },
         )
 
+    finally:
+        await release_rag_index(job_id)
+
+async def admit_document(pdf_path: str, key: str):
+    """
+    Pre-flight size estimate + budget check for a PDF.
+    Returns (estimate, lane); raises 413/429 when the budgets are exceeded.
+    """
+    try:
+        estimate = await executors.pdf_executor.run(budget.estimate_document, pdf_path)
+    except executors.ExecutorSaturated as exc:
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Could not read PDF: {exc}")
+    return estimate, admit_estimate(key, estimate)
+
+
+def admit_estimate(key: str, estimate: dict) -> str:
+    """Budget check for an existing estimate; returns the lane or raises 413/429."""
+    try:
+        return budget.admit(key, estimate)
+    except budget.BudgetExceeded as exc:
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+        raise HTTPException(status_code=exc.status_code, detail=str(exc), headers=headers)
+
 @app.options("/upload")
 async def upload_options():
     """Handle CORS preflight requests for upload"""
@@ -288,21 +990,45 @@ async def upload(file: UploadFile = File(...)):
 
 
 @app.post("/summaries/start")
-async def start_summarization(request: PDFRequest):
+async def start_summarization(request: SummaryStartRequest):
     """
     Kick off summarization for a PDF that has already been uploaded.
     Returns a job_id that can be polled for status/results.
+    `based_on` names a finished job for a previous version of the contract;
+    its unchanged clauses are reused and the job records a `change_map`.
     """
     pdf_path = request.pdf_path
     if not os.path.exists(pdf_path):
         raise HTTPException(status_code=404, detail="PDF file not found")
     if not pdf_path.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="File must be a PDF")
+    if request.based_on:
+        try:
+            base_oid = ObjectId(request.based_on)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid based_on job_id format")
+        base_job = await db["summaries"].find_one({"_id": base_oid}, {"status": 1})
+        if not base_job:
+            raise HTTPException(status_code=404, detail="based_on job not found")
+        if base_job.get("status") not in ("COMPLETED", "PARTIAL_FAILURE"):
+            raise HTTPException(
+                status_code=409,
+                detail=f"based_on job is {base_job.get('status')}; it must be completed",
+            )
+
+    job_oid = ObjectId()
+    job_id = str(job_oid)
+    estimate, lane = await admit_document(pdf_path, job_id)
 
     job_doc = {
+        "_id": job_oid,
         "pdf_path": pdf_path,
         "status": "PENDING",
+        "estimate": estimate,
+        "lane": lane,
         "created_at": datetime.datetime.utcnow(),
+        "updated_at": datetime.datetime.utcnow(),
+        "version": 0,
         "model_version": summarizer.MODEL_VERSION,
         "prompt_version": summarizer.PROMPT_VERSION,
         "clause_summaries": [],
@@ -310,33 +1036,219 @@ async def start_summarization(request: PDFRequest):
         "failure_count": 0,
         "total_clauses": 0,
         "error": None,
+        "based_on": request.based_on,
     }
 
-    insert_result = await db["summaries"].insert_one(job_doc)
-    job_id = str(insert_result.inserted_id)
+    try:
+        await db["summaries"].insert_one(job_doc)
+    except Exception:
+        budget.release(job_id)
+        raise
 
     # Fire-and-forget background task
-    asyncio.create_task(run_summarization_job(job_id, pdf_path))
+    task = asyncio.create_task(run_summarization_job(job_id, pdf_path, lane, request.based_on))
+    jobs.register(job_id, task)
+
+    return {"job_id": job_id, "status": "PENDING", "lane": lane, "estimate": estimate}
+
+
+@app.post("/summaries/{job_id}/cancel")
+async def cancel_summarization(job_id: str):
+    """
+    Cancel a pending or running summarization job.
+    In-flight LLM calls are interrupted and the job's RAG index is removed.
+    """
+    try:
+        job_oid = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job_id format")
+
+    job = await db["summaries"].find_one({"_id": job_oid}, {"status": 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Summarization job not found")
+    if job.get("status") in jobs.TERMINAL_STATUSES:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job already finished with status {job.get('status')}",
+        )
+
+    # The job may finish between the read above and this write
+    result = await update_job(
+        {"_id": job_oid, "status": {"$nin": list(jobs.TERMINAL_STATUSES)}},
+        {
+            "$set": {
+                "status": "CANCELLED",
+                "cancelled_at": datetime.datetime.utcnow(),
+            }
+        },
+    )
+    if result.modified_count == 0:
+        job = await db["summaries"].find_one({"_id": job_oid}, {"status": 1})
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job already finished with status {(job or {}).get('status')}",
+        )
+    interrupted = jobs.request_cancel(job_id)
 
-    return {"job_id": job_id, "status": "PENDING"}
+    return {"job_id": job_id, "status": "CANCELLED", "interrupted": interrupted}
+
+
+@app.post("/summaries/{job_id}/retry")
+async def retry_summarization(job_id: str):
+    """
+    Re-run only the failed clauses of a PARTIAL_FAILURE (or FAILED) job.
+    The job is updated in place and can be polled as usual.
+    """
+    try:
+        job_oid = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job_id format")
+
+    job = await db["summaries"].find_one(
+        {"_id": job_oid},
+        {"status": 1, "clause_summaries.is_failed": 1, "estimate": 1, "pdf_path": 1},
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Summarization job not found")
+    if job.get("status") not in ("PARTIAL_FAILURE", "FAILED") or jobs.is_running(job_id):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Only finished PARTIAL_FAILURE or FAILED jobs can be retried (status: {job.get('status')})",
+        )
+    failed = sum(1 for item in job.get("clause_summaries") or [] if item.get("is_failed"))
+    if failed == 0:
+        raise HTTPException(status_code=409, detail="Job has no failed clauses to retry")
+
+    # Retries go through the same budget and lanes as new jobs. The
+    # reservation key is unique so a losing concurrent retry cannot
+    # release the winner's reservation.
+    budget_key = f"retry-{job_id}-{ObjectId()}"
+    if job.get("estimate"):
+        lane = admit_estimate(budget_key, job["estimate"])
+    else:
+        _, lane = await admit_document(job.get("pdf_path") or "", budget_key)
+
+    # Claim the job atomically so two retry calls cannot race
+    try:
+        claimed = await update_job(
+            {"_id": job_oid, "status": job.get("status")},
+            {
+                "$set": {"status": "PROCESSING", "retried_at": datetime.datetime.utcnow()},
+                "$inc": {"retry_count": 1},
+            },
+        )
+    except Exception:
+        budget.release(budget_key)
+        raise
+    if claimed.modified_count == 0:
+        budget.release(budget_key)
+        raise HTTPException(status_code=409, detail="Job is already being retried")
+
+    task = asyncio.create_task(run_retry_job(job_id, job.get("status"), lane, budget_key))
+    jobs.register(job_id, task)
+
+    return {"job_id": job_id, "status": "PROCESSING", "retrying_clauses": failed, "lane": lane}
+
+
+def sse_event(event: str, data: dict, event_id: int = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/summaries/{job_id}/stream")
+async def stream_summarization(job_id: str, request: Request, offset: int = 0):
+    """
+    Server-sent events with the executive summary as it is generated.
+    `token` events carry text from `offset` on (their id is the new offset,
+    so EventSource reconnects resume via Last-Event-ID); `reset` means the
+    text restarted; `done` carries the final summary and status.
+    Jobs running in another worker are followed through the persisted
+    partial summary instead of live tokens.
+    """
+    try:
+        job_oid = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job_id format")
+    if not await db["summaries"].find_one({"_id": job_oid}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Summarization job not found")
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    async def events():
+        position = max(0, offset)
+        generation = None
+        while not await request.is_disconnected():
+            stream = streams.get_stream(job_id)
+            if stream is not None:
+                if generation is not None and stream.generation != generation:
+                    position = 0
+                    yield sse_event("reset", {"offset": 0})
+                generation = stream.generation
+                text, done = stream.text, stream.done
+            else:
+                job = await db["summaries"].find_one(
+                    {"_id": job_oid},
+                    {"status": 1, "document_summary": 1, "document_summary_partial": 1},
+                )
+                done = job is None or job.get("status") in jobs.TERMINAL_STATUSES
+                text = (job or {}).get("document_summary" if done else "document_summary_partial") or ""
+                if len(text) < position:
+                    position = 0
+                    yield sse_event("reset", {"offset": 0})
+
+            if len(text) > position:
+                yield sse_event("token", {"offset": position, "text": text[position:]}, len(text))
+                position = len(text)
+            if done:
+                job = await db["summaries"].find_one({"_id": job_oid}, {"status": 1})
+                yield sse_event("done", {"text": text, "status": (job or {}).get("status")}, len(text))
+                return
+
+            if stream is not None:
+                await stream.wait_for_change(timeout=15)
+            else:
+                await asyncio.sleep(1)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/summaries/{job_id}")
-async def get_summarization(job_id: str):
+async def get_summarization(job_id: str, request: Request):
     """
     Retrieve summarization status/results by job_id.
+    Sends an ETag keyed on the job version; a poll with a matching
+    If-None-Match gets 304 without the job being loaded.
     """
     try:
         job_oid = ObjectId(job_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid job_id format")
 
+    headers = {"Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        current = await db["summaries"].find_one({"_id": job_oid}, {"version": 1})
+        if current:
+            etag = make_etag(job_id, current.get("version", 0))
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={**headers, "ETag": etag})
+
     job = await db["summaries"].find_one({"_id": job_oid})
     if not job:
         raise HTTPException(status_code=404, detail="Summarization job not found")
 
     job["id"] = str(job.pop("_id"))
-    return jsonable_encoder(job)
+    headers["ETag"] = make_etag(job_id, job.get("version", 0))
+    return FastJSONResponse(job, headers=headers)
 
 @app.options("/predict-clauses")
 async def predict_clauses_options():
@@ -354,21 +1266,157 @@ async def predict_clauses(request: PDFRequest):
     if not hasattr(clause_utils, "model"):
         raise HTTPException(status_code=500, detail="Model not loaded yet")
 
-    print(f"Analyzing: {pdf_path}")
-    results = clause_utils.predict_clauses(pdf_path)
+    file_hash = await executors.pdf_executor.run(compute_file_hash, pdf_path)
+    results = await find_cached_clauses(file_hash)
+    cached = results is not None
+    if not cached:
+        results, other_hashes = await run_clause_prediction(pdf_path)
+        await cache_clauses(file_hash, results, pdf_path, other_hashes)
+
+    # History records reference the stored results instead of copying them
+    await db["clauses"].insert_one(
+        {
+            "pdf_path": pdf_path,
+            "file_hash": file_hash,
+            "model_version": clause_utils.CLAUSE_MODEL_VERSION,
+            "clause_count": len(results),
+            "cached": cached,
+            "timestamp": datetime.datetime.utcnow(),
+        }
+    )
 
-    file_hash = compute_file_hash(pdf_path)
-    await cache_clauses(file_hash, results, pdf_path)
+    return FastJSONResponse(
+        {"predicted_clauses": results, "saved_to_db": True, "file_hash": file_hash, "cached": cached},
+        headers={"ETag": make_etag(file_hash, clause_utils.CLAUSE_MODEL_VERSION)},
+    )
 
-    # Save to MongoDB
-    doc = {
-        "pdf_path": pdf_path,
-        "predicted_clauses": results,
-        "timestamp": datetime.datetime.utcnow(),
+
+async def run_clause_prediction(pdf_path: str):
+    """
+    Admit and run LegalBERT clause prediction for a PDF on the inference pool.
+    Returns (results, hashes of the segments classified "Other"); the latter
+    let a later amended version skip re-classifying them.
+    """
+    request_key = f"predict-{ObjectId()}"
+    estimate, lane = await admit_document(pdf_path, request_key)
+    # Oversized documents queue as batch work instead of competing with interactive requests
+    priority = executors.BATCH if lane == budget.LANE_LOW else executors.INTERACTIVE
+
+    print(f"Analyzing: {pdf_path} ({estimate['pages']} pages, {lane} lane)")
+    try:
+        results, other_hashes, _ = await executors.inference_executor.run(
+            clause_utils.predict_clauses_incremental, pdf_path, priority=priority
+        )
+    except executors.ExecutorSaturated as exc:
+        raise HTTPException(
+            status_code=429,
+            detail="Clause prediction is at capacity, please retry shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    finally:
+        budget.release(request_key)
+    return results, other_hashes
+
+
+MAX_PAGE_SIZE = 200
+
+
+def check_page_size(limit: int):
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+@app.get("/categories")
+async def category_counts():
+    """
+    Per-category clause and document counts across all analyzed documents.
+    """
+    pipeline = [
+        {"$match": {"model_version": clause_utils.CLAUSE_MODEL_VERSION}},
+        {"$group": {"_id": {"category": "$category", "file_hash": "$file_hash"}, "clauses": {"$sum": 1}}},
+        {"$group": {"_id": "$_id.category", "clauses": {"$sum": "$clauses"}, "documents": {"$sum": 1}}},
+        {"$sort": {"documents": -1, "_id": 1}},
+    ]
+    categories = [
+        {"category": row["_id"], "documents": row["documents"], "clauses": row["clauses"]}
+        async for row in db["clause_occurrences"].aggregate(pipeline, allowDiskUse=True)
+    ]
+    return {"model_version": clause_utils.CLAUSE_MODEL_VERSION, "categories": categories}
+
+
+@app.get("/categories/{category}/documents")
+async def category_documents(category: str, after: Optional[str] = None, limit: int = 50):
+    """
+    Documents containing at least one clause of `category`, ordered by file
+    hash. Pass the returned `next_after` as `after` to fetch the next page.
+    """
+    check_page_size(limit)
+    match = {"model_version": clause_utils.CLAUSE_MODEL_VERSION, "category": category}
+    occurrences = db["clause_occurrences"]
+    # Page over distinct file hashes first: each step is one seek on the
+    # (model_version, category, file_hash) index past the previous hash, so
+    # a page costs `limit` seeks however many clauses the category has.
+    hashes = []
+    cursor_hash = after
+    while len(hashes) < limit:
+        query = dict(match)
+        if cursor_hash:
+            query["file_hash"] = {"$gt": cursor_hash}
+        row = await occurrences.find_one(query, {"_id": 0, "file_hash": 1}, sort=[("file_hash", 1)])
+        if row is None:
+            break
+        cursor_hash = row["file_hash"]
+        hashes.append(cursor_hash)
+
+    clause_nos = {file_hash: [] for file_hash in hashes}
+    if hashes:
+        cursor = occurrences.find(
+            {**match, "file_hash": {"$in": hashes}}, {"_id": 0, "file_hash": 1, "clause_no": 1}
+        ).sort([("file_hash", 1), ("clause_no", 1)])
+        async for row in cursor:
+            clause_nos[row["file_hash"]].append(row.get("clause_no"))
+    documents = [
+        {"file_hash": file_hash, "clauses": len(clause_nos[file_hash]), "clause_nos": clause_nos[file_hash]}
+        for file_hash in hashes
+    ]
+    return {
+        "category": category,
+        "documents": documents,
+        "next_after": documents[-1]["file_hash"] if len(documents) == limit else None,
     }
-    await db["clauses"].insert_one(doc)
 
-    return {"predicted_clauses": results, "saved_to_db": True}
+
+@app.get("/categories/{category}/clauses")
+async def category_clauses(category: str, file_hash: Optional[str] = None,
+                           after: Optional[str] = None, limit: int = 50):
+    """
+    Clause occurrences of `category` (optionally within one document) with
+    their character offsets, paginated by the returned `next_after` cursor.
+    """
+    check_page_size(limit)
+    query = {"model_version": clause_utils.CLAUSE_MODEL_VERSION, "category": category}
+    if file_hash:
+        query["file_hash"] = file_hash
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    cursor = (
+        db["clause_occurrences"]
+        .find(query, {"model_version": 0})
+        .sort("_id", 1)
+        .limit(limit)
+    )
+    clauses = []
+    async for row in cursor:
+        row["id"] = str(row.pop("_id"))
+        clauses.append(row)
+    return {
+        "category": category,
+        "clauses": clauses,
+        "next_after": clauses[-1]["id"] if len(clauses) == limit else None,
+    }
 
 
 @app.get("/warmup")
@@ -387,6 +1435,105 @@ async def warmup():
         status = f"error: {exc}"
     return {"status": status}
 
+@app.get("/admin/executors")
+async def executor_stats():
+    """
+    Report utilisation of the per-workload thread pools.
+    """
+    return {"pools": executors.pool_stats(), "budget": budget.budget_stats()}
+
+@app.get("/admin/llm")
+async def llm_stats():
+    """
+    Timeout/retry/hedging counters, latency percentiles, breaker state
+    and per-backend load/health.
+    """
+    return {**summarizer.llm_caller.stats(), "backends": summarizer.llm_pool.stats()}
+
+
+@app.get("/admin/llm-cache")
+async def llm_cache_stats():
+    """
+    Hit/miss counters for the LLM summary cache.
+    """
+    if summarizer.summary_cache is None:
+        return {"enabled": False}
+    return summarizer.summary_cache.stats()
+
+
+@app.post("/search/clauses")
+async def search_clauses(request: ClauseSearchRequest):
+    """
+    Semantic search over the clauses of every analyzed document,
+    optionally restricted to one predicted category.
+    """
+    if corpus_index is None:
+        raise HTTPException(status_code=503, detail="Corpus index is not available")
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if not 1 <= request.k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    try:
+        results = await executors.embedding_executor.run(
+            corpus_index.search, request.query, request.k, request.category
+        )
+    except executors.ExecutorSaturated as exc:
+        raise HTTPException(
+            status_code=429,
+            detail="Search is at capacity, please retry shortly",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    return {"query": request.query, "category": request.category, "results": results}
+
+
+@app.get("/admin/corpus-index")
+async def corpus_index_stats():
+    """
+    Size and IVF parameters of the cross-document corpus index.
+    """
+    if corpus_index is None:
+        return {"enabled": False}
+    return await executors.embedding_executor.run(corpus_index.stats)
+
+
+@app.get("/admin/db-indexes")
+async def db_index_report():
+    """
+    Missing MongoDB indexes and query plans of the hot lookups.
+    """
+    return jsonable_encoder(await index_report())
+
+
+@app.get("/admin/index-storage")
+async def index_storage_stats():
+    """
+    RAG index storage usage, retention policy and the last GC run.
+    """
+    if index_janitor is None:
+        return {"enabled": False}
+    storage = await executors.embedding_executor.run(rag.storage_stats)
+    return {**storage, "policy": index_janitor.policy(), "last_gc": index_janitor.last_run}
+
+
+@app.post("/admin/index-storage/gc")
+async def run_index_gc():
+    """
+    Run one RAG index GC/compaction pass now.
+    """
+    if index_janitor is None:
+        raise HTTPException(status_code=400, detail="RAG is not available")
+    return await index_janitor.collect()
+
+
+@app.get("/admin/embedding-cache")
+async def embedding_cache_stats():
+    """
+    Hit/miss counters and size of the persistent clause embedding cache.
+    """
+    if not (RAG_AVAILABLE and rag):
+        return {"enabled": False}
+    return await executors.embedding_executor.run(rag.embedding_function.stats)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -12,4 +12,238 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 
 client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
\ No newline at end of file
+db = client[DB_NAME]
+
+# -----------------------------------------------------------------------------
+# Index provisioning
+# -----------------------------------------------------------------------------
+# Optional retention (0 = keep forever). TTL indexes remove documents once the
+# field is older than the limit; jobs still running have no completed_at.
+CLAUSE_CACHE_TTL_DAYS = float(os.getenv("CLAUSE_CACHE_TTL_DAYS", "0"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "0"))
+CLAUSE_HISTORY_TTL_DAYS = float(os.getenv("CLAUSE_HISTORY_TTL_DAYS", "0"))
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "100"))
+
+# MongoDB error codes
+_DUPLICATE_KEY = 11000
+_INDEX_OPTIONS_CONFLICT = 85
+_INDEX_KEY_SPECS_CONFLICT = 86
+
+
+def _ttl(days: float) -> dict:
+    return {"expireAfterSeconds": int(days * 86400)} if days > 0 else {}
+
+
+def index_specs() -> list:
+    """(collection, keys, options) for every index the server relies on."""
+    return [
+        # Clause results, stored once per (content hash, classifier version)
+        ("clause_cache", [("file_hash", 1), ("model_version", 1)],
+         {"name": "file_hash_model_unique", "unique": True}),
+        # Refreshed on cache hits, so the TTL evicts entries nobody has used
+        ("clause_cache", [("last_used_at", 1)], {"name": "last_used_at", **_ttl(CLAUSE_CACHE_TTL_DAYS)}),
+        # Job listing by status, newest first; lookups by document
+        ("summaries", [("status", 1), ("created_at", -1)], {"name": "status_created_at"}),
+        ("summaries", [("created_at", -1)], {"name": "created_at"}),
+        ("summaries", [("file_hash", 1)], {"name": "file_hash"}),
+        ("summaries", [("completed_at", 1)], {"name": "completed_at", **_ttl(JOB_RETENTION_DAYS)}),
+        # /predict-clauses history (references clause_cache by file_hash)
+        ("clauses", [("timestamp", -1)], {"name": "timestamp", **_ttl(CLAUSE_HISTORY_TTL_DAYS)}),
+        ("clauses", [("file_hash", 1)], {"name": "file_hash"}),
+        # Flattened clause occurrences for category queries
+        ("clause_occurrences", [("model_version", 1), ("category", 1), ("file_hash", 1)],
+         {"name": "category_file_hash"}),
+        ("clause_occurrences", [("model_version", 1), ("category", 1), ("_id", 1)],
+         {"name": "category_id"}),
+        ("clause_occurrences", [("file_hash", 1), ("model_version", 1)], {"name": "file_hash_model"}),
+        # RAG index usage, scanned by the GC
+        ("rag_indexes", [("last_used_at", 1)], {"name": "last_used_at"}),
+    ]
+
+
+# Superseded indexes, dropped at startup: (collection, name)
+OBSOLETE_INDEXES = [
+    ("clause_cache", "file_hash_unique"),
+    ("clause_cache", "updated_at"),
+]
+
+
+async def _dedupe_clause_cache():
+    """Keep the newest clause_cache entry per (file_hash, model_version) so it can be unique."""
+    pipeline = [
+        {"$sort": {"updated_at": -1}},
+        {
+            "$group": {
+                "_id": {"file_hash": "$file_hash", "model_version": "$model_version"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    removed = 0
+    async for group in db["clause_cache"].aggregate(pipeline, allowDiskUse=True):
+        result = await db["clause_cache"].delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    print(f"🧹 Removed {removed} duplicate clause_cache entries")
+
+
+async def migrate_clause_cache(model_version: str):
+    """
+    Stamp clause_cache entries written before results were versioned with
+    the current classifier version, so they keep serving as cache hits.
+    Where a versioned entry for the same file already exists it wins and
+    the legacy one is removed.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    migrated = removed = 0
+    cursor = db["clause_cache"].find({"model_version": {"$exists": False}}, {"_id": 1})
+    async for entry in cursor:
+        try:
+            await db["clause_cache"].update_one(
+                {"_id": entry["_id"]}, {"$set": {"model_version": model_version}}
+            )
+            migrated += 1
+        except DuplicateKeyError:
+            await db["clause_cache"].delete_one({"_id": entry["_id"]})
+            removed += 1
+    if migrated or removed:
+        print(f"🧹 clause_cache: stamped {migrated} legacy entries with {model_version}, "
+              f"removed {removed} superseded ones")
+
+
+async def _find_index(collection: str, keys: list):
+    """(name, info) of the existing index on exactly `keys`, or (None, None)."""
+    for name, info in (await db[collection].index_information()).items():
+        if [(field, int(direction)) for field, direction in info["key"]] == keys:
+            return name, info
+    return None, None
+
+
+async def _create_index(collection: str, keys: list, options: dict):
+    from pymongo.errors import OperationFailure
+
+    try:
+        await db[collection].create_index(keys, **options)
+    except OperationFailure as exc:
+        if exc.code == _DUPLICATE_KEY and collection == "clause_cache":
+            await _dedupe_clause_cache()
+            await db[collection].create_index(keys, **options)
+        elif exc.code in (_INDEX_OPTIONS_CONFLICT, _INDEX_KEY_SPECS_CONFLICT):
+            name, existing = await _find_index(collection, keys)
+            if existing is None:
+                # Conflict is on the name: another key pattern uses it
+                name = options["name"]
+            if (existing is not None and "expireAfterSeconds" in existing
+                    and "expireAfterSeconds" in options):
+                # Same index with a different TTL: update it in place
+                await db.command(
+                    "collMod", collection,
+                    index={"keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]},
+                )
+            else:
+                # TTL added/removed, renamed or otherwise changed: rebuild it
+                print(f"Rebuilding index {collection}.{name} with new options {options}")
+                await db[collection].drop_index(name)
+                await db[collection].create_index(keys, **options)
+        else:
+            raise
+
+
+async def _backfill_last_used():
+    """Entries from before last_used_at existed would never expire without it."""
+    await db["clause_cache"].update_many(
+        {"last_used_at": {"$exists": False}},
+        [{"$set": {"last_used_at": {"$ifNull": ["$updated_at", "$$NOW"]}}}],
+    )
+
+
+async def ensure_indexes():
+    """Create missing indexes; failures are logged per index, never raised."""
+    try:
+        await _backfill_last_used()
+    except Exception as exc:
+        print(f"⚠️ Could not backfill clause_cache.last_used_at: {exc}")
+    for collection, name in OBSOLETE_INDEXES:
+        try:
+            if name in await db[collection].index_information():
+                await db[collection].drop_index(name)
+                print(f"Dropped obsolete index {collection}.{name}")
+        except Exception as exc:
+            print(f"⚠️ Could not drop index {collection}.{name}: {exc}")
+    for collection, keys, options in index_specs():
+        try:
+            await _create_index(collection, keys, options)
+        except Exception as exc:
+            print(f"⚠️ Could not create index {collection}.{options['name']}: {exc}")
+
+
+def _plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    children = list(plan.get("inputStages", []))
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            children.append(plan[key])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+# Representative queries whose plans the diagnostic checks
+PLAN_PROBES = [
+    ("clause_cache", {"file_hash": "", "model_version": ""}, None),
+    ("summaries", {"status": "PROCESSING"}, [("created_at", -1)]),
+    ("summaries", {"file_hash": ""}, None),
+    ("clause_occurrences", {"model_version": "", "category": ""}, [("file_hash", 1)]),
+]
+
+
+async def index_report() -> dict:
+    """
+    Missing indexes (by key pattern) and the plans of the server's hot
+    queries. A plan is flagged slow if it scans the collection, examines
+    far more documents than it returns, or exceeds SLOW_QUERY_MS.
+    """
+    missing = []
+    existing_by_collection = {}
+    for collection, keys, options in index_specs():
+        if collection not in existing_by_collection:
+            existing_by_collection[collection] = await db[collection].index_information()
+        existing = existing_by_collection[collection]
+        match = next(
+            (info for info in existing.values()
+             if [(field, int(direction)) for field, direction in info["key"]] == keys),
+            None,
+        )
+        if match is None:
+            missing.append({"collection": collection, "name": options["name"], "keys": dict(keys)})
+        elif match.get("expireAfterSeconds") != options.get("expireAfterSeconds"):
+            missing.append({
+                "collection": collection, "name": options["name"], "keys": dict(keys),
+                "ttl_expected": options.get("expireAfterSeconds"),
+                "ttl_actual": match.get("expireAfterSeconds"),
+            })
+
+    plans = []
+    for collection, query, sort in PLAN_PROBES:
+        cursor = db[collection].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        stages = _plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {}))
+        stats = explained.get("executionStats", {})
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+        millis = stats.get("executionTimeMillis", 0)
+        plans.append({
+            "collection": collection,
+            "query": query,
+            "sort": dict(sort) if sort else None,
+            "stages": stages,
+            "docs_examined": examined,
+            "returned": returned,
+            "millis": millis,
+            "slow": "COLLSCAN" in stages or examined > max(100, 10 * returned) or millis > SLOW_QUERY_MS,
+        })
+    return {"missing_indexes": missing, "plans": plans}
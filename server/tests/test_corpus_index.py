@@ -0,0 +1,119 @@
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+from utils import corpus_index
+from utils.corpus_index import CorpusIndex
+
+DIM = 64
+
+
+class BagOfWordsEmbeddings:
+    """Deterministic embedder: sum of a fixed random vector per word."""
+
+    def _word(self, word: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha1(word.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(DIM)
+
+    def embed_query(self, text: str) -> list:
+        return sum((self._word(w) for w in text.lower().split()), np.zeros(DIM)).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self.embed_query(text) for text in texts]
+
+
+def document(doc: int, n: int = 20) -> list:
+    categories = ["Payment", "Termination"]
+    return [
+        {"clause_no": i + 1, "category": categories[i % 2], "clause": f"doc{doc} clause{i} topic{i % 7} text"}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return CorpusIndex(str(tmp_path), BagOfWordsEmbeddings(), nprobe=4)
+
+
+def test_exact_search_finds_the_clause(index):
+    assert index.add_document("hash0", "job0", document(0)) == 20
+    top = index.search("doc0 clause3 topic3 text", k=3)
+    assert top[0]["clause"] == "doc0 clause3 topic3 text"
+    assert top[0]["file_hash"] == "hash0" and top[0]["clause_no"] == 4
+    assert [r["score"] for r in top] == sorted((r["score"] for r in top), reverse=True)
+
+
+def test_category_filter_and_duplicate_documents(index):
+    index.add_document("hash0", "job0", document(0))
+    assert index.add_document("hash0", "job1", document(0)) == 0
+    results = index.search("doc0 clause3 topic3 text", k=5, category="Payment")
+    assert len(results) == 5 and all(r["category"] == "Payment" for r in results)
+    assert index.search("anything", category="Unknown category") == []
+
+
+def test_reload_keeps_vectors_and_metadata(tmp_path):
+    first = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings())
+    first.add_document("hash0", "job0", document(0))
+    reopened = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings())
+    assert reopened.size == 20 and reopened.dim == DIM
+    assert reopened.search("doc0 clause5 topic5 text", k=1)[0]["clause_no"] == 6
+
+
+def test_ivf_training_recall_and_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "CORPUS_TRAIN_MIN", 200)
+    index = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings(), nprobe=4)
+    for doc in range(12):
+        index.add_document(f"hash{doc}", f"job{doc}", document(doc))
+    index.wait_for_training()
+    # Training starts at 200 clauses and snapshots whatever exists by then
+    assert index.centroids is not None and index.trained_size in (200, 220)
+    assert sum(len(ids) for ids in index._lists) == index.size
+
+    hits = sum(
+        index.search(f"doc{doc} clause{i} topic{i % 7} text", k=1)[0]["clause"]
+        == f"doc{doc} clause{i} topic{i % 7} text"
+        for doc in range(12) for i in range(0, 20, 5)
+    )
+    assert hits >= 0.9 * 48
+
+    reopened = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings(), nprobe=4)
+    assert reopened.centroids is not None
+    assert [len(ids) for ids in reopened._lists] == [len(ids) for ids in index._lists]
+
+
+def test_truncates_vectors_without_metadata(tmp_path):
+    index = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings())
+    index.add_document("hash0", "job0", document(0))
+    with open(index._vectors_path, "ab") as handle:
+        handle.write(b"\0" * DIM * 2 * 3)  # crash after writing vectors
+    reopened = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings())
+    assert reopened.size == 20
+    assert reopened.vectors.shape == (20, DIM)
+
+
+def test_training_runs_off_the_calling_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "CORPUS_TRAIN_MIN", 40)
+    started, release = threading.Event(), threading.Event()
+    kmeans = corpus_index.spherical_kmeans
+
+    def slow_kmeans(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return kmeans(*args, **kwargs)
+
+    monkeypatch.setattr(corpus_index, "spherical_kmeans", slow_kmeans)
+    index = CorpusIndex(str(tmp_path), BagOfWordsEmbeddings(), nprobe=4)
+    index.add_document("hash0", "job0", document(0))
+    index.add_document("hash1", "job1", document(1))
+    assert started.wait(5) and index.training
+    # Inserts and exact-scan searches proceed while k-means runs
+    assert index.add_document("hash2", "job2", document(2)) == 20
+    assert index.search("doc2 clause4 topic4 text", k=1)[0]["clause_no"] == 5
+
+    release.set()
+    index.wait_for_training()
+    assert not index.training and index.centroids is not None
+    # Rows added during training were assigned when the centroids swapped in
+    assert sum(len(ids) for ids in index._lists) == index.size == 60
@@ -0,0 +1,33 @@
+from utils.dedup import clause_hash, find_duplicates
+
+ROYALTY = (
+    "The Licensee shall pay the Licensor a royalty of {} percent of Net Sales "
+    "of all Licensed Products sold in the Territory during each calendar quarter, "
+    "payable within thirty (30) days after the end of such quarter."
+)
+
+
+def test_exact_duplicates_share_a_representative():
+    texts = ["1. Governing law is New York.", "Other text entirely here.", "7) GOVERNING LAW is New York"]
+    assert find_duplicates(texts, near=False) == [0, 1, 0]
+    assert clause_hash(texts[0]) == clause_hash(texts[2])
+
+
+def test_near_duplicates_are_not_merged_without_near():
+    texts = [ROYALTY.format("five (5)"), ROYALTY.format("fifteen (15)")]
+    assert find_duplicates(texts, near=False) == [0, 1]
+    # The near-duplicate pass would merge them
+    assert find_duplicates(texts, near=True) == [0, 0]
+
+
+def test_leading_quantities_are_not_numbering():
+    clause = "{} days after the Effective Date, the Licensee shall pay the first instalment."
+    texts = [clause.format("30"), clause.format("90")]
+    assert clause_hash(texts[0]) != clause_hash(texts[1])
+    assert find_duplicates(texts, near=False) == [0, 1]
+
+
+def test_delimited_enumerators_are_stripped():
+    variants = ["12. Fees are due monthly.", "3.2(a) Fees are due monthly.",
+                "(iv) Fees are due monthly.", "Section 5.1 Fees are due monthly."]
+    assert len({clause_hash(text) for text in variants}) == 1
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from utils.embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.documents = 0
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [float(len(text)), 1.0]
+
+
+def test_queries_are_served_but_never_stored(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"))
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, "model", store)
+
+    cached.embed_documents(["1. Governing law is New York."])
+    cached.embed_query("Governing law is New York")  # same normalized clause
+    cached.embed_query("which clauses mention indemnity?")
+    assert inner.documents == 1 and inner.queries == 1
+    assert store.stats()["entries"] == 1
+
+
+def test_prune_applies_ttl_then_lru_budget(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"), ttl_seconds=3600, max_entries=2)
+    store.put_many("model", {f"h{i}": [0.0, 1.0] for i in range(4)})
+    now = time.time()
+    with store._lock:
+        store._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE text_hash = ?",
+            [(now - 7200, "h0"), (now - 30, "h1"), (now - 20, "h2"), (now - 10, "h3")],
+        )
+        store._conn.commit()
+
+    assert store.prune() == 2
+    assert set(store.get_many("model", ["h0", "h1", "h2", "h3"])) == {"h2", "h3"}
+
+
+def test_puts_trigger_pruning(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"), max_entries=3, prune_every=5)
+    for i in range(5):
+        store.put_many("model", {f"h{i}": [0.0, 1.0]})
+    assert store.stats()["entries"] == 3
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.executors import BACKGROUND, BATCH, INTERACTIVE, ExecutorSaturated, WorkloadPool
+
+
+def make_pool(max_queue: int = 8) -> WorkloadPool:
+    return WorkloadPool("test", 1, max_queue, retry_after=3)
+
+
+async def occupy(pool: WorkloadPool, gate: threading.Event) -> asyncio.Task:
+    """Fill the pool's only worker until `gate` is set."""
+    task = asyncio.ensure_future(pool.run(gate.wait, priority=BATCH, job_id="blocker"))
+    while pool.stats()["running"] == 0:
+        await asyncio.sleep(0)
+    return task
+
+
+async def queue_calls(pool: WorkloadPool, order: list, calls) -> list:
+    tasks = []
+    for label, priority, job_id in calls:
+        tasks.append(asyncio.ensure_future(
+            pool.run(order.append, label, priority=priority, job_id=job_id)
+        ))
+        await asyncio.sleep(0)  # enqueue in arrival order
+    return tasks
+
+
+def test_interactive_work_runs_before_batch_and_background():
+    async def main():
+        pool, gate, order = make_pool(), threading.Event(), []
+        blocker = await occupy(pool, gate)
+        tasks = await queue_calls(pool, order, [
+            ("background", BACKGROUND, "job-a"),
+            ("batch", BATCH, "job-b"),
+            ("interactive", INTERACTIVE, None),
+        ])
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        pool.shutdown()
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "batch", "background"]
+
+
+def test_jobs_of_equal_priority_share_the_pool():
+    async def main():
+        pool, gate, order = make_pool(), threading.Event(), []
+        blocker = await occupy(pool, gate)
+        tasks = await queue_calls(pool, order, [
+            ("a1", BATCH, "job-a"), ("a2", BATCH, "job-a"), ("a3", BATCH, "job-a"),
+            ("b1", BATCH, "job-b"), ("b2", BATCH, "job-b"),
+        ])
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        pool.shutdown()
+        return order
+
+    assert asyncio.run(main()) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_interactive_calls_are_rejected_when_saturated():
+    async def main():
+        pool, gate = make_pool(max_queue=1), threading.Event()
+        blocker = await occupy(pool, gate)
+        queued = asyncio.ensure_future(pool.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated) as error:
+            await pool.run(lambda: "rejected")
+        assert error.value.retry_after == 3
+        # Batch work is never rejected, it waits its turn
+        batch = asyncio.ensure_future(pool.run(lambda: "batch", priority=BATCH, job_id="job"))
+        gate.set()
+        results = await asyncio.gather(blocker, queued, batch)
+        stats = pool.stats()
+        pool.shutdown()
+        return results[1:], stats
+
+    results, stats = asyncio.run(main())
+    assert results == ["queued", "batch"]
+    assert stats["running"] == 0 and stats["active_jobs"] == 0
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_thread_finishes():
+    async def main():
+        pool, gate = make_pool(), threading.Event()
+        blocker = await occupy(pool, gate)
+        blocker.cancel()
+        await asyncio.sleep(0.01)
+        running_while_thread_alive = pool.stats()["running"]
+        gate.set()
+        result = await pool.run(lambda: "next")
+        stats = pool.stats()
+        pool.shutdown()
+        return running_while_thread_alive, result, stats
+
+    running, result, stats = asyncio.run(main())
+    assert running == 1
+    assert result == "next" and stats["running"] == 0
@@ -0,0 +1,27 @@
+import random
+
+from utils import extractive
+
+
+def test_short_documents_are_returned_whole():
+    text = "The Supplier shall deliver the goods within ten business days. " \
+           "The Buyer shall pay each invoice within thirty days of receipt."
+    assert extractive.summarize(text) == " ".join(extractive.split_sentences(text))
+
+
+def test_summary_picks_sentences_in_document_order():
+    random.seed(1)
+    words = [f"term{i}" for i in range(5000)]
+    sentences = [
+        "The " + " ".join(random.choice(words) for _ in range(12)) + "." for _ in range(3000)
+    ]
+    summary = extractive.summarize(" ".join(sentences), max_sentences=4)
+    picked = extractive.split_sentences(summary)
+    assert len(picked) == 4
+    positions = [sentences.index(sentence) for sentence in picked]
+    assert positions == sorted(positions)
+
+
+def test_vocabulary_is_capped():
+    sentences = [f"Clause number {i} mentions uniqueterm{i} and commonterm today." for i in range(5000)]
+    assert extractive._tfidf(sentences).shape == (5000, extractive.MAX_VOCABULARY)
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils import hf_backend
+from utils.hf_backend import HFBatchedGenerator
+
+
+class FakeGenerator(HFBatchedGenerator):
+    """The batching front end with a recorded, model-free generate."""
+
+    def __init__(self, max_batch=4, window_ms=10, delay=0.0):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.delay = delay
+        self.batches = []
+        self._lock = threading.Lock()
+        self._init_queue()
+
+    def _generate_batch(self, prompts):
+        with self._lock:
+            self.batches.append(list(prompts))
+        time.sleep(self.delay)
+        return [f" out:{prompt} " for prompt in prompts]
+
+
+def test_concurrent_prompts_share_a_batch():
+    generator = FakeGenerator(max_batch=4)
+
+    async def main():
+        return await asyncio.gather(*[generator.generate(f"p{i}") for i in range(6)])
+
+    assert asyncio.run(main()) == [f"out:p{i}" for i in range(6)]
+    assert [len(batch) for batch in generator.batches] == [4, 2]
+
+
+def test_retried_prompt_joins_the_running_generation():
+    generator = FakeGenerator(delay=0.2)
+
+    async def main():
+        first = asyncio.ensure_future(generator.generate("slow"))
+        await asyncio.sleep(0.05)
+        # The caller times out and retries while the batch is still running
+        first.cancel()
+        return await generator.generate("slow")
+
+    assert asyncio.run(main()) == "out:slow"
+    assert generator.batches == [["slow"]]
+    assert generator.counters["joined"] == 1
+
+
+def test_abandoned_prompts_are_not_generated():
+    generator = FakeGenerator(window_ms=50)
+
+    async def main():
+        abandoned = asyncio.ensure_future(generator.generate("gone"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await generator.generate("kept")
+
+    assert asyncio.run(main()) == "out:kept"
+    assert generator.batches == [["kept"]]
+    assert generator.counters["dropped"] == 1
+
+
+def test_generate_errors_reach_every_caller():
+    generator = FakeGenerator()
+
+    def boom(prompts):
+        raise RuntimeError("out of memory")
+
+    generator._generate_batch = boom
+
+    async def main():
+        return await asyncio.gather(
+            generator.generate("a"), generator.generate("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not generator._flush_tasks
+
+
+def test_tiny_model_on_cpu():
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    model_id = "sshleifer/tiny-gpt2"
+    try:
+        generator = HFBatchedGenerator(model_id=model_id, adapter_path="", max_new_tokens=4)
+    except OSError as exc:
+        pytest.skip(f"{model_id} not available: {exc}")
+
+    async def main():
+        return await asyncio.gather(*[generator.generate(f"Clause {i}:") for i in range(3)])
+
+    outputs = asyncio.run(main())
+    assert len(outputs) == 3 and all(isinstance(text, str) for text in outputs)
+    assert generator.counters["batches"] == 1
@@ -0,0 +1,52 @@
+from utils import incremental
+from utils.dedup import clause_hash
+
+
+def previous(*texts, category="Payment"):
+    return [
+        {"clause_no": i + 1, "original_text": text, "category": category, "summary_text": f"s{i}"}
+        for i, text in enumerate(texts)
+    ]
+
+
+def clauses(*texts):
+    return [{"clause_no": i + 1, "clause": text, "category": "Payment"} for i, text in enumerate(texts)]
+
+
+def test_identical_versions_are_all_unchanged():
+    unchanged, change_map = incremental.align(previous("a one", "b two"), clauses("a one", "b two"))
+    assert unchanged == {0: 0, 1: 1}
+    assert incremental.change_counts(change_map) == {
+        "unchanged": 2, "modified": 0, "inserted": 0, "deleted": 0,
+    }
+
+
+def test_renumbering_and_formatting_are_not_changes():
+    unchanged, _ = incremental.align(
+        previous("1. Fees are due monthly.", "2. Term is one year."),
+        clauses("3.1 FEES are due monthly", "3.2 Term is one year"),
+    )
+    assert unchanged == {0: 0, 1: 1}
+
+
+def test_insert_modify_delete():
+    old = previous("intro", "fee is 5 percent", "term one year", "obsolete")
+    new = clauses("intro", "fee is 15 percent", "new clause", "term one year")
+    unchanged, change_map = incremental.align(old, new)
+    assert unchanged == {0: 0, 3: 2}
+    changes = [(c["change"], c["old_clause_no"], c["new_clause_no"]) for c in change_map]
+    assert changes == [
+        ("unchanged", 1, 1),
+        ("modified", 2, 2),
+        ("inserted", None, 3),
+        ("unchanged", 3, 4),
+        ("deleted", 4, None),
+    ]
+
+
+def test_known_categories_include_other_segments():
+    known = incremental.known_categories(
+        previous("fee is 5 percent") + [{"original_text": "x", "category": "Unknown"}],
+        other_hashes=["abc"],
+    )
+    assert known == {"abc": "Other", clause_hash("fee is 5 percent"): "Payment"}
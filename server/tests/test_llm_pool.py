@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from utils.llm_pool import BackendPool, NoHealthyBackend
+from utils.llm_resilience import ResilientCaller
+
+
+class StubLLM:
+    """Stands in for a backend's chain: sleeps `delay` and echoes its url."""
+
+    def __init__(self, url: str, delay: float = 0.0):
+        self.url = url
+        self.delay = delay
+        self.inflight = 0
+        self.peak = 0
+
+    async def ainvoke(self, inputs):
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await asyncio.sleep(self.delay)
+            return self.url
+        finally:
+            self.inflight -= 1
+
+
+def make_pool(urls, delay=0.0, max_inflight=4):
+    pool = BackendPool(urls, lambda url: StubLLM(url, delay), max_inflight=max_inflight)
+    for backend in pool.backends:
+        # Bypass prompt | llm | parser re-binding; the stub is the whole chain
+        backend.chain_for = lambda chain, backend=backend: backend.llm
+    return pool
+
+
+def test_waiting_for_a_slot_does_not_count_against_the_deadline():
+    # One slot, 0.3s calls, 0.5s deadline: the 6th call waits ~1.5s in the
+    # queue but every call must still succeed without tripping the breaker
+    pool = make_pool(["http://a"], delay=0.3, max_inflight=1)
+    caller = ResilientCaller(timeout=0.5, max_retries=0, slots=pool)
+
+    async def main():
+        return await asyncio.gather(*[
+            caller.call(lambda backend: pool.ainvoke(None, {}, backend)) for _ in range(6)
+        ])
+
+    assert asyncio.run(main()) == ["http://a"] * 6
+    assert caller.counters["timeouts"] == 0
+    assert caller.breaker.state == "closed"
+    assert pool.backends[0].llm.peak == 1
+    assert pool.backends[0].inflight == 0
+
+
+def test_respects_per_backend_cap_and_spreads_load():
+    pool = make_pool(["http://a", "http://b"], delay=0.05, max_inflight=2)
+
+    async def main():
+        return await asyncio.gather(*[pool.ainvoke(None, {}) for _ in range(8)])
+
+    results = asyncio.run(main())
+    assert results.count("http://a") == results.count("http://b") == 4
+    assert all(backend.llm.peak <= 2 for backend in pool.backends)
+    assert all(backend.inflight == 0 for backend in pool.backends)
+
+
+def test_skips_ejected_backends():
+    pool = make_pool(["http://a", "http://b"])
+    for _ in range(3):
+        pool.backends[0].record_failure()
+
+    async def main():
+        return await asyncio.gather(*[pool.ainvoke(None, {}) for _ in range(3)])
+
+    assert asyncio.run(main()) == ["http://b"] * 3
+
+
+def test_no_healthy_backend():
+    pool = make_pool(["http://a"])
+    pool.backends[0].healthy = False
+    with pytest.raises(NoHealthyBackend):
+        asyncio.run(pool.ainvoke(None, {}))
+
+
+def test_cancelled_call_releases_its_slot():
+    pool = make_pool(["http://a"], delay=1.0, max_inflight=1)
+    caller = ResilientCaller(timeout=0.05, max_retries=0, slots=pool)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(lambda backend: pool.ainvoke(None, {}, backend))
+        # The slot is freed once the cancelled call has unwound
+        await asyncio.sleep(0.01)
+        return pool.backends[0].inflight
+
+    assert asyncio.run(main()) == 0
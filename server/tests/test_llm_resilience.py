@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from utils.llm_resilience import CircuitOpenError, ResilientCaller
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FlakyCall:
+    """Fails with `errors` (in order) and then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self, slot=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("utils.llm_resilience.LLM_RETRY_BASE_DELAY", 0.0)
+
+
+def test_retries_transient_errors():
+    caller = ResilientCaller(max_retries=2)
+    call = FlakyCall(ConnectionError("down"), ConnectionError("down"))
+    assert run(caller.call(call)) == "ok"
+    assert call.calls == 3
+    assert caller.counters["retries"] == 2
+    assert caller.breaker.state == "closed"
+
+
+def test_does_not_retry_permanent_errors():
+    caller = ResilientCaller(max_retries=2)
+    call = FlakyCall(ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        run(caller.call(call))
+    assert call.calls == 1
+    assert caller.breaker.consecutive_failures == 0
+
+
+def test_deadline_raises_timeout():
+    async def slow(slot=None):
+        await asyncio.sleep(1)
+
+    caller = ResilientCaller(timeout=0.05, max_retries=0)
+    with pytest.raises(asyncio.TimeoutError):
+        run(caller.call(slow))
+    assert caller.counters["timeouts"] == 1
+
+
+def test_breaker_opens_and_rejects_without_calling():
+    caller = ResilientCaller(max_retries=0)
+    caller.breaker.threshold = 2
+    call = FlakyCall(*[ConnectionError("down")] * 5)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            run(caller.call(call))
+    assert caller.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        run(caller.call(call))
+    assert call.calls == 2
+
+
+def test_hedge_wins_when_primary_is_slow(monkeypatch):
+    monkeypatch.setattr("utils.llm_resilience.LLM_HEDGE_MIN_SAMPLES", 1)
+    caller = ResilientCaller(timeout=2, hedge=True)
+    caller.latency.record(0.01)
+    calls = []
+
+    async def make_call(slot=None):
+        calls.append(len(calls))
+        await asyncio.sleep(1 if len(calls) == 1 else 0)
+        return "hedged" if len(calls) > 1 else "primary"
+
+    assert run(caller.call(make_call)) == "hedged"
+    assert caller.counters["hedges"] == 1
+    assert caller.counters["hedge_wins"] == 1
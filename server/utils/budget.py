@@ -0,0 +1,140 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import pdfplumber
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# Per-job hard limits: anything larger is rejected up front (413)
+MAX_JOB_PAGES = int(os.getenv("MAX_JOB_PAGES", "600"))
+MAX_JOB_BYTES = int(os.getenv("MAX_JOB_BYTES", str(100 * 1024 * 1024)))
+# Documents above this size run in the low-priority lane
+LARGE_DOC_PAGES = int(os.getenv("LARGE_DOC_PAGES", "120"))
+# Total estimated pages that may be in flight across all jobs (429 beyond)
+GLOBAL_PAGE_BUDGET = int(os.getenv("GLOBAL_PAGE_BUDGET", "2000"))
+BUDGET_RETRY_AFTER = int(os.getenv("BUDGET_RETRY_AFTER", "30"))
+
+# Rough per-page yields used for the pre-flight estimate
+CHARS_PER_PAGE = int(os.getenv("EST_CHARS_PER_PAGE", "3000"))
+CLAUSES_PER_PAGE = int(os.getenv("EST_CLAUSES_PER_PAGE", "8"))
+CHARS_PER_TOKEN = 4
+
+LANE_STANDARD = "standard"
+LANE_LOW = "low"
+
+
+class BudgetExceeded(Exception):
+    """Raised when a document does not fit the per-job or global budget."""
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def estimate_document(pdf_path: str) -> dict:
+    """
+    Cheap pre-flight estimate: byte size and page count come from the file,
+    clause and token counts are extrapolated from the page count.
+    Opening the PDF only reads its page tree, not the page contents.
+    """
+    byte_size = os.path.getsize(pdf_path)
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = len(pdf.pages)
+    est_chars = pages * CHARS_PER_PAGE
+    return {
+        "pages": pages,
+        "bytes": byte_size,
+        "est_clauses": pages * CLAUSES_PER_PAGE,
+        "est_tokens": est_chars // CHARS_PER_TOKEN,
+    }
+
+
+# Estimated pages currently reserved, keyed by job id / request id
+_reservations: Dict[str, int] = {}
+
+
+def reserved_pages() -> int:
+    return sum(_reservations.values())
+
+
+def admit(key: str, estimate: dict) -> str:
+    """
+    Check `estimate` against the per-job and global budgets and reserve its
+    pages under `key`. Returns the lane the work should run in.
+    """
+    if estimate["pages"] > MAX_JOB_PAGES or estimate["bytes"] > MAX_JOB_BYTES:
+        raise BudgetExceeded(
+            f"Document too large ({estimate['pages']} pages, {estimate['bytes']} bytes); "
+            f"limit is {MAX_JOB_PAGES} pages / {MAX_JOB_BYTES} bytes",
+            status_code=413,
+        )
+    if reserved_pages() + estimate["pages"] > GLOBAL_PAGE_BUDGET:
+        raise BudgetExceeded(
+            "Server is at document capacity, please retry shortly",
+            status_code=429,
+            retry_after=BUDGET_RETRY_AFTER,
+        )
+    _reservations[key] = estimate["pages"]
+    return LANE_LOW if estimate["pages"] > LARGE_DOC_PAGES else LANE_STANDARD
+
+
+def release(key: str):
+    _reservations.pop(key, None)
+
+
+def budget_stats() -> dict:
+    return {
+        "reserved_pages": reserved_pages(),
+        "global_page_budget": GLOBAL_PAGE_BUDGET,
+        "active": len(_reservations),
+        "max_job_pages": MAX_JOB_PAGES,
+        "max_job_bytes": MAX_JOB_BYTES,
+        "large_doc_pages": LARGE_DOC_PAGES,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Per-job resource accounting
+# -----------------------------------------------------------------------------
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            # ru_maxrss is KB on Linux
+            return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except ImportError:
+            return 0.0
+
+
+class StageRecorder:
+    """
+    Records wall time per pipeline stage and the process memory high-water
+    mark, sampled at every stage boundary, for one job.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.peak_rss_mb = current_rss_mb()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(
+                self.stages.get(name, 0.0) + time.perf_counter() - start, 3
+            )
+            self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+
+    def as_dict(self) -> dict:
+        return {"stages": dict(self.stages), "peak_rss_mb": self.peak_rss_mb}
@@ -0,0 +1,343 @@
+import math
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+CORPUS_INDEX_ENABLED = os.getenv("CORPUS_INDEX_ENABLED", "true").lower() == "true"
+CORPUS_INDEX_DIR = os.getenv("CORPUS_INDEX_DIR", "./corpus_index")
+# Inverted lists scanned per query; more = better recall, slower search
+CORPUS_NPROBE = int(os.getenv("CORPUS_NPROBE", "16"))
+# Brute force below this size; IVF is trained once the corpus reaches it
+CORPUS_TRAIN_MIN = int(os.getenv("CORPUS_TRAIN_MIN", "4096"))
+# Retrain (new centroids, full reassignment) when the corpus grows this much
+CORPUS_RETRAIN_GROWTH = 4.0
+CORPUS_TRAIN_SAMPLE = 100_000
+KMEANS_ITERATIONS = 12
+# Rows scored per matmul, bounding temporary memory for large scans
+SCAN_BLOCK_ROWS = 65536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every row, in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = 1234) -> np.ndarray:
+    """K-means on unit vectors with cosine similarity; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty clusters with random points
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class CorpusIndex:
+    """
+    Cross-document clause search: an IVF (inverted file) index over the
+    clause embeddings of every analyzed document.
+
+    - Vectors are appended to a float16 file and memory-mapped, so the
+      corpus does not have to fit in RAM.
+    - Clause metadata and IVF list assignments live in SQLite next to it.
+    - Until CORPUS_TRAIN_MIN clauses exist, search is an exact scan. Then
+      ~4*sqrt(N) centroids are trained with spherical k-means. A query
+      scans only the CORPUS_NPROBE lists nearest to it. The index is
+      retrained when the corpus grows CORPUS_RETRAIN_GROWTH-fold.
+    - A category filter is applied to the candidates. Probing widens
+      until k matches are found or every list has been scanned.
+    - Training triggered by add_document runs on a background thread;
+      searches and inserts keep using the previous lists until the new
+      centroids are swapped in.
+    """
+
+    def __init__(self, path: str = CORPUS_INDEX_DIR, embeddings=None, nprobe: int = CORPUS_NPROBE):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.embeddings = embeddings
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(path, "vectors.f16")
+        self._centroids_path = os.path.join(path, "centroids.npy")
+        self._train_thread: Optional[threading.Thread] = None
+
+        self._conn = sqlite3.connect(os.path.join(path, "meta.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS clauses ("
+            " id INTEGER PRIMARY KEY, file_hash TEXT NOT NULL, job_id TEXT,"
+            " clause_no INTEGER, category TEXT, text TEXT, list_id INTEGER NOT NULL DEFAULT -1)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS clauses_file_hash ON clauses (file_hash)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._load()
+
+    # -- persistence --------------------------------------------------------
+
+    def _setting(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_setting(self, key: str, value):
+        self._conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _load(self):
+        dim = self._setting("dim")
+        self.dim = int(dim) if dim else None
+        self.trained_size = int(self._setting("trained_size") or 0)
+        self.centroids = np.load(self._centroids_path) if os.path.exists(self._centroids_path) else None
+
+        rows = self._conn.execute("SELECT id, list_id, category FROM clauses ORDER BY id").fetchall()
+        self.size = len(rows)
+        self._category_codes: Dict[str, int] = {}
+        codes = np.empty(self.size, dtype=np.int32)
+        assign = np.empty(self.size, dtype=np.int32)
+        for row_id, list_id, category in rows:
+            codes[row_id] = self._category_codes.setdefault(category or "", len(self._category_codes))
+            assign[row_id] = list_id
+        self._codes = codes
+        self._assign = assign
+        self._build_lists()
+
+        # Drop vectors whose metadata never got committed (crash mid-insert)
+        if self.dim and os.path.exists(self._vectors_path):
+            expected = self.size * self.dim * 2
+            if os.path.getsize(self._vectors_path) > expected:
+                with open(self._vectors_path, "r+b") as handle:
+                    handle.truncate(expected)
+        self._open_vectors()
+
+    def _open_vectors(self):
+        if self.size and self.dim:
+            self.vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r",
+                                     shape=(self.size, self.dim))
+        else:
+            self.vectors = None
+
+    def _build_lists(self):
+        self._lists: List[List[int]] = []
+        if self.centroids is None:
+            return
+        self._lists = [[] for _ in range(len(self.centroids))]
+        order = np.argsort(self._assign, kind="stable")
+        bounds = np.searchsorted(self._assign[order], np.arange(len(self.centroids) + 1))
+        for list_id in range(len(self.centroids)):
+            self._lists[list_id] = order[bounds[list_id] : bounds[list_id + 1]].tolist()
+
+    # -- writes -------------------------------------------------------------
+
+    def contains(self, file_hash: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM clauses WHERE file_hash = ? LIMIT 1", (file_hash,)
+            ).fetchone() is not None
+
+    def add_document(self, file_hash: str, job_id: str, clauses: List[dict]) -> int:
+        """
+        Append a document's clauses ({clause_no, category, clause}); a file
+        hash already in the corpus is skipped. Returns the number added.
+        """
+        clauses = [c for c in clauses if (c.get("clause") or "").strip()]
+        if not clauses or self.contains(file_hash):
+            return 0
+        vectors = _normalize(self.embeddings.embed_documents([c["clause"] for c in clauses]))
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_setting("dim", self.dim)
+            assign = (
+                _nearest(vectors, self.centroids) if self.centroids is not None
+                else np.full(len(vectors), -1, dtype=np.int32)
+            )
+            start = self.size
+            # Vectors first: on a crash, extra vectors are truncated at load
+            with open(self._vectors_path, "ab") as handle:
+                handle.write(vectors.astype(np.float16).tobytes())
+            self._conn.executemany(
+                "INSERT INTO clauses (id, file_hash, job_id, clause_no, category, text, list_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (start + i, file_hash, job_id, c.get("clause_no"), c.get("category"),
+                     c["clause"], int(assign[i]))
+                    for i, c in enumerate(clauses)
+                ],
+            )
+            self._conn.commit()
+
+            codes = [
+                self._category_codes.setdefault(c.get("category") or "", len(self._category_codes))
+                for c in clauses
+            ]
+            self._codes = np.concatenate([self._codes, np.asarray(codes, dtype=np.int32)])
+            self._assign = np.concatenate([self._assign, assign])
+            for offset, list_id in enumerate(assign):
+                if list_id >= 0:
+                    self._lists[list_id].append(start + offset)
+            self.size += len(clauses)
+            self._open_vectors()
+            needs_training = (
+                self.size >= CORPUS_TRAIN_MIN
+                and (self.centroids is None or self.size >= self.trained_size * CORPUS_RETRAIN_GROWTH)
+            )
+            if needs_training and not self.training:
+                # k-means over a large corpus takes minutes; keep it off the
+                # embedding worker that RAG indexing and searches share
+                self._train_thread = threading.Thread(
+                    target=self._train_in_background, name="corpus-ivf-train", daemon=True
+                )
+                self._train_thread.start()
+        return len(clauses)
+
+    @property
+    def training(self) -> bool:
+        return self._train_thread is not None and self._train_thread.is_alive()
+
+    def _train_in_background(self):
+        try:
+            self.train()
+        except Exception as exc:
+            print(f"⚠️ Corpus IVF training failed: {exc}")
+
+    def wait_for_training(self, timeout: Optional[float] = None):
+        thread = self._train_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def train(self):
+        """
+        (Re)build the IVF: k-means on a sample, then reassign every vector.
+        Runs outside the lock on a snapshot; rows added meanwhile are
+        assigned when the result is swapped in.
+        """
+        with self._lock:
+            vectors, size = self.vectors, self.size
+        if vectors is None or size < 2:
+            return
+        nlist = max(1, min(size // 39, int(4 * math.sqrt(size))))
+        rng = np.random.default_rng(size)
+        sample_ids = np.sort(rng.choice(size, size=min(size, CORPUS_TRAIN_SAMPLE), replace=False))
+        sample = _normalize(vectors[sample_ids])
+        print(f"🧭 Training corpus IVF: {nlist} lists over {size} clauses")
+        centroids = spherical_kmeans(sample, nlist)
+        assign = _nearest(vectors, centroids)
+
+        with self._lock:
+            if self.size > size:
+                assign = np.concatenate([assign, _nearest(self.vectors[size:], centroids)])
+            np.save(self._centroids_path, centroids)
+            self._conn.executemany(
+                "UPDATE clauses SET list_id = ? WHERE id = ?",
+                ((int(list_id), row_id) for row_id, list_id in enumerate(assign)),
+            )
+            self._set_setting("trained_size", size)
+            self._conn.commit()
+            self.centroids = centroids
+            self.trained_size = size
+            self._assign = assign
+            self._build_lists()
+
+    # -- reads --------------------------------------------------------------
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self.centroids is None:
+            return np.arange(self.size)
+        scores = self.centroids @ query
+        nprobe = min(nprobe, len(scores))
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        ids = [self._lists[p] for p in probes]
+        return np.fromiter((i for ids_ in ids for i in ids_), dtype=np.int64)
+
+    def search(self, text: str, k: int = 10, category: Optional[str] = None,
+               nprobe: Optional[int] = None) -> List[dict]:
+        query = _normalize(np.asarray(self.embeddings.embed_query(text), dtype=np.float32))
+        with self._lock:
+            if not self.size:
+                return []
+            code = None
+            if category is not None:
+                code = self._category_codes.get(category)
+                if code is None:
+                    return []
+            nprobe = nprobe or self.nprobe
+            nlist = len(self.centroids) if self.centroids is not None else 1
+            while True:
+                candidates = self._candidates(query, nprobe)
+                if code is not None:
+                    candidates = candidates[self._codes[candidates] == code]
+                # Filtered queries may need more lists to find k matches
+                if len(candidates) >= k or nprobe >= nlist:
+                    break
+                nprobe *= 4
+            vectors = self.vectors
+
+        if not len(candidates):
+            return []
+        candidates = np.sort(candidates)
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), SCAN_BLOCK_ROWS):
+            block = candidates[start : start + SCAN_BLOCK_ROWS]
+            scores[start : start + len(block)] = np.asarray(vectors[block], dtype=np.float32) @ query
+        top_k = min(k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        ids = [int(candidates[i]) for i in top]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, file_hash, job_id, clause_no, category, text FROM clauses"
+                f" WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [
+            {
+                "score": round(float(scores[i]), 4),
+                "file_hash": by_id[row_id][1],
+                "job_id": by_id[row_id][2],
+                "clause_no": by_id[row_id][3],
+                "category": by_id[row_id][4],
+                "clause": by_id[row_id][5],
+            }
+            for i, row_id in zip(top, ids)
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(DISTINCT file_hash) FROM clauses").fetchone()[0]
+            return {
+                "clauses": self.size,
+                "documents": documents,
+                "dim": self.dim,
+                "trained": self.centroids is not None,
+                "training": self.training,
+                "nlist": len(self.centroids) if self.centroids is not None else 0,
+                "nprobe": self.nprobe,
+                "trained_size": self.trained_size,
+                "vector_bytes": os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0,
+                "categories": len(self._category_codes),
+            }
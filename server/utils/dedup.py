@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Set
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+DEDUP_ENABLED = os.getenv("CLAUSE_DEDUP_ENABLED", "true").lower() == "true"
+# Jaccard similarity (over word shingles) above which clauses are merged
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# LSH banding: NUM_BANDS * ROWS_PER_BAND == NUM_PERM
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1234)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+# Leading numbering such as "12.", "3.2(a)", "(iv)", "Section 5.1", "3.1 Fees".
+# A number needs a delimiter, a "Section" keyword or (multi-level only) a
+# capitalized heading after it: "30 days after..." and "1.5 times the fee"
+# start with quantities, and stripping them would merge "30" with "90".
+_NUMBERING = re.compile(
+    r"^\s*(?:"
+    r"(?:section|article|clause)\s+\d+(?:\.\d+)*(?:\([a-z0-9]+\))*[.):]?"
+    r"|\d+(?:\.\d+)*(?:\([a-z0-9]+\))+[.):]?"
+    r"|\d+(?:\.\d+)*[.):]"
+    r"|\d+(?:\.\d+)+(?=\s+(?-i:[A-Z]))"
+    r"|\(?[a-z]\)|\(?[ivxlc]+\)|[ivxlc]+\."
+    r")\s+",
+    re.I,
+)
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_clause(text: str) -> str:
+    """Lowercase, drop leading numbering and punctuation, collapse whitespace."""
+    text = _NUMBERING.sub("", text or "")
+    text = _NON_WORD.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def clause_hash(text: str) -> str:
+    return hashlib.sha1(normalize_clause(text).encode("utf-8")).hexdigest()
+
+
+def _shingles(normalized: str) -> Set[str]:
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: Set[str]) -> np.ndarray:
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+            for s in shingles
+        ),
+        dtype=np.uint64,
+        count=len(shingles),
+    ) % _MERSENNE_PRIME
+    # (a * x + b) mod p for every permutation at once: (NUM_PERM, n_shingles)
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def find_duplicates(texts: List[str], near: bool = True) -> List[int]:
+    """
+    Group exact duplicates (same normalized hash) and, with `near`,
+    near-duplicates (MinHash/LSH candidates whose shingle Jaccard >=
+    NEAR_DUP_THRESHOLD).
+    Returns, for every text, the index of its group's representative
+    (the first member in document order); unique texts map to themselves.
+
+    Near-duplicate groups can differ in exactly the words that matter
+    ("five (5)" vs "fifteen (15)" percent), so they must never share a
+    summary; only use near=True for work that tolerates that.
+    """
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    # 1. Exact duplicates
+    normalized = [normalize_clause(t) for t in texts]
+    first_by_text: Dict[str, int] = {}
+    for idx, norm in enumerate(normalized):
+        if norm in first_by_text:
+            union(first_by_text[norm], idx)
+        else:
+            first_by_text[norm] = idx
+
+    if not near:
+        return [find(idx) for idx in range(len(texts))]
+
+    # 2. Near duplicates among the remaining distinct texts
+    distinct = [idx for idx in first_by_text.values() if normalized[idx]]
+    shingle_sets = {idx: _shingles(normalized[idx]) for idx in distinct}
+    buckets = defaultdict(list)
+    for idx in distinct:
+        signature = _minhash(shingle_sets[idx])
+        for band in range(NUM_BANDS):
+            rows = signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+            buckets[(band, rows.tobytes())].append(idx)
+
+    checked = set()
+    for members in buckets.values():
+        for a_pos in range(len(members)):
+            for b_pos in range(a_pos + 1, len(members)):
+                pair = (members[a_pos], members[b_pos])
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                a, b = shingle_sets[pair[0]], shingle_sets[pair[1]]
+                if len(a & b) / len(a | b) >= NEAR_DUP_THRESHOLD:
+                    union(*pair)
+
+    return [find(idx) for idx in range(len(texts))]
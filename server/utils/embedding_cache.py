@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.dedup import clause_hash
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+# Retention: entries unused for the TTL are dropped, then the least recently
+# used ones beyond the entry budget (~768 bytes per MiniLM vector)
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+# New entries written between two retention passes
+EMBEDDING_CACHE_PRUNE_EVERY = int(os.getenv("EMBEDDING_CACHE_PRUNE_EVERY", "10000"))
+# Hits refresh last_used at most this often, so reads rarely write
+_TOUCH_INTERVAL = 24 * 3600
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingStore:
+    """
+    Persistent (model id, normalized text hash) -> float16 vector store in
+    SQLite. Vectors are stored as raw bytes; float16 halves the footprint
+    and is well within the precision cosine similarity needs.
+    Size is bounded by a TTL and an LRU entry budget (see prune()).
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, ttl_seconds: int = EMBEDDING_CACHE_TTL_SECONDS,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 prune_every: int = EMBEDDING_CACHE_PRUNE_EVERY):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_every = max(1, prune_every)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " last_used REAL, PRIMARY KEY (model, text_hash))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_used" not in columns:
+            # Stores from before retention; their rows count as least recently used
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._written = 0
+        self.last_prune: Optional[dict] = None
+        self.prune()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? "
+                        f"AND text_hash IN ({placeholders}) "
+                        f"AND (last_used IS NULL OR last_used < ?)",
+                        [now, model, *chunk, now - _TOUCH_INTERVAL],
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        now = time.time()
+        rows = [
+            (model, text_hash, np.asarray(vector, dtype=np.float16).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._written += len(rows)
+            due = self._written >= self.prune_every
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete entries unused for ttl_seconds, then the least recently used
+        ones until at most max_entries remain. Returns the number deleted.
+        Freed pages are reused by later inserts; the file is not shrunk.
+        """
+        now = time.time()
+        with self._lock:
+            self._written = 0
+            deleted = 0
+            if self.ttl_seconds > 0:
+                deleted += self._conn.execute(
+                    "DELETE FROM embeddings WHERE last_used IS NULL OR last_used < ?",
+                    (now - self.ttl_seconds,),
+                ).rowcount
+            if self.max_entries > 0:
+                count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if count > self.max_entries:
+                    # NULL (never recorded) sorts first
+                    deleted += self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN ("
+                        " SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+            self._conn.commit()
+            self.last_prune = {"at": now, "deleted": deleted}
+        if deleted:
+            print(f"🧹 Embedding cache pruned {deleted} entries")
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "path": self.path,
+            "entries": count,
+            "bytes": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "last_prune": self.last_prune,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingStore and
+    only sends cache misses to the underlying model. Store errors are logged
+    and treated as misses. Only documents (clauses) are written to the
+    store; queries are looked up but never persisted.
+    """
+
+    def __init__(self, inner: Embeddings, model_id: str, store: Optional[EmbeddingStore] = None):
+        self.inner = inner
+        self.model_id = model_id
+        self.store = store
+        self.counters = {"hits": 0, "misses": 0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.store is None:
+            return self.inner.embed_documents(texts)
+
+        hashes = [clause_hash(text) for text in texts]
+        try:
+            cached = self.store.get_many(self.model_id, hashes)
+        except Exception as exc:
+            print(f"⚠️ Embedding cache read failed: {exc}")
+            cached = {}
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        self.counters["hits"] += len(texts) - len(missing)
+        self.counters["misses"] += len(missing)
+
+        if missing:
+            computed = self.inner.embed_documents(list(missing.values()))
+            fresh = {
+                text_hash: np.asarray(vector, dtype=np.float32)
+                for text_hash, vector in zip(missing.keys(), computed)
+            }
+            try:
+                self.store.put_many(self.model_id, fresh)
+            except Exception as exc:
+                print(f"⚠️ Embedding cache write failed: {exc}")
+            cached.update(fresh)
+
+        return [cached[text_hash].tolist() for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Retriever and /search/clauses queries are arbitrary user text;
+        # reuse a stored clause vector but never persist the query
+        if self.store is not None:
+            text_hash = clause_hash(text)
+            try:
+                cached = self.store.get_many(self.model_id, [text_hash])
+            except Exception as exc:
+                print(f"⚠️ Embedding cache read failed: {exc}")
+                cached = {}
+            if text_hash in cached:
+                self.counters["hits"] += 1
+                return cached[text_hash].tolist()
+            self.counters["misses"] += 1
+        return self.inner.embed_query(text)
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.store is not None, "model": self.model_id, **self.counters}
+        if self.store is not None:
+            try:
+                stats.update(self.store.stats())
+            except Exception as exc:
+                stats["error"] = str(exc)
+        return stats
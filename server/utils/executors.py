@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# One pool per workload class so PDF parsing, LegalBERT inference and
+# embedding work never queue behind each other.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+# In-process LLM generation (SUMMARIZER_BACKEND=hf) runs for minutes per
+# batch, so it gets its own workers instead of blocking LegalBERT inference
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "1"))
+
+# Interactive requests allowed to wait for a free worker before we reject
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "4"))
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "8"))
+EMBEDDING_QUEUE_SIZE = int(os.getenv("EMBEDDING_QUEUE_SIZE", "8"))
+# Seconds suggested to clients in the Retry-After header when saturated
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "10"))
+
+# Scheduling priorities (lower runs first)
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor's admission queue is full."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} executor is saturated")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "job_key", "seq", "future", "cancelled")
+
+    def __init__(self, priority: int, job_key: str, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.job_key = job_key
+        self.seq = seq
+        self.future = future
+        self.cancelled = False
+
+
+class WorkloadPool:
+    """
+    A sized thread pool for one workload class with a priority scheduler.
+
+    Work is dispatched by (priority, job share, arrival order): interactive
+    requests always go before batch work, and among jobs of equal priority
+    the one that has received the fewest slots goes next, so one huge
+    document cannot starve the others. Interactive callers are bounded by
+    `max_queue` and rejected with ExecutorSaturated when the pool is full;
+    batch and background work simply waits its turn.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-worker"
+        )
+        self._running = 0
+        # priority -> job -> FIFO of waiters
+        self._queues: Dict[int, Dict[str, Deque[_Waiter]]] = {}
+        self._seq = itertools.count()
+        # Slots granted per active job; reset when a job has nothing pending
+        self._served: Dict[str, int] = {}
+        self._active: Dict[str, int] = {}
+
+    def _waiting(self) -> List[_Waiter]:
+        return [
+            waiter
+            for jobs in self._queues.values()
+            for queue in jobs.values()
+            for waiter in queue
+            if not waiter.cancelled
+        ]
+
+    def stats(self) -> dict:
+        waiting = self._waiting()
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting_interactive": sum(1 for w in waiting if w.priority == INTERACTIVE),
+            "waiting_batch": sum(1 for w in waiting if w.priority != INTERACTIVE),
+            "active_jobs": len(self._active),
+        }
+
+    def _waiting_interactive(self) -> int:
+        jobs = self._queues.get(INTERACTIVE, {})
+        return sum(1 for queue in jobs.values() for waiter in queue if not waiter.cancelled)
+
+    def _join(self, job_key: str):
+        if job_key not in self._active:
+            # New jobs start level with the least-served active job so they
+            # neither jump the whole queue nor wait behind old history.
+            self._served[job_key] = min(self._served.values(), default=0)
+            self._active[job_key] = 0
+        self._active[job_key] += 1
+
+    def _leave(self, job_key: str):
+        self._active[job_key] -= 1
+        if self._active[job_key] <= 0:
+            del self._active[job_key]
+            self._served.pop(job_key, None)
+
+    async def _acquire(self, priority: int, job_key: str):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, job_key, next(self._seq), loop.create_future())
+        self._queues.setdefault(priority, {}).setdefault(job_key, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just as we were cancelled; hand it on.
+                self._release()
+            else:
+                waiter.cancelled = True
+            raise
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in sorted(self._queues):
+            jobs = self._queues[priority]
+            for job_key in list(jobs):
+                queue = jobs[job_key]
+                while queue and (queue[0].cancelled or queue[0].future.done()):
+                    queue.popleft()
+                if not queue:
+                    del jobs[job_key]
+            if not jobs:
+                del self._queues[priority]
+                continue
+            # Least-served job first; oldest request breaks ties
+            job_key = min(
+                jobs, key=lambda key: (self._served.get(key, 0), jobs[key][0].seq)
+            )
+            waiter = jobs[job_key].popleft()
+            if not jobs[job_key]:
+                del jobs[job_key]
+            return waiter
+        return None
+
+    def _dispatch(self):
+        while self._running < self.max_workers:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._running += 1
+            self._served[waiter.job_key] = self._served.get(waiter.job_key, 0) + 1
+            waiter.future.set_result(None)
+
+    def _release(self, _future=None):
+        self._running -= 1
+        self._dispatch()
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = INTERACTIVE,
+        job_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Run `fn(*args)` on the pool.
+        Interactive calls raise ExecutorSaturated if the pool is full.
+        """
+        if priority == INTERACTIVE and (
+            self._running + self._waiting_interactive() >= self.max_workers + self.max_queue
+        ):
+            raise ExecutorSaturated(self.name, self.retry_after)
+
+        job_key = job_id or f"request-{next(self._seq)}"
+        self._join(job_key)
+        try:
+            await self._acquire(priority, job_key)
+            try:
+                future = asyncio.wrap_future(self._executor.submit(fn, *args))
+            except Exception:
+                self._release()
+                raise
+            # Release the slot when the thread finishes, not when the caller
+            # stops waiting: a disconnected client still occupies its worker.
+            future.add_done_callback(self._release)
+            return await asyncio.shield(future)
+        finally:
+            self._leave(job_key)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_executor = WorkloadPool("pdf", PDF_WORKERS, PDF_QUEUE_SIZE, INFERENCE_RETRY_AFTER)
+inference_executor = WorkloadPool(
+    "inference", INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_RETRY_AFTER
+)
+embedding_executor = WorkloadPool(
+    "embeddings", EMBEDDING_WORKERS, EMBEDDING_QUEUE_SIZE, INFERENCE_RETRY_AFTER
+)
+# Only batch work is submitted here; threads are started on first use
+generation_executor = WorkloadPool("generation", GENERATION_WORKERS, 0, INFERENCE_RETRY_AFTER)
+
+ALL_POOLS = (pdf_executor, inference_executor, embedding_executor, generation_executor)
+
+
+def configure_torch_threads():
+    """
+    Split the machine's cores between the pools that run torch so that
+    concurrent inference and embedding threads do not oversubscribe the CPU.
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+
+    cores = os.cpu_count() or 1
+    torch_workers = inference_executor.max_workers + embedding_executor.max_workers
+    intra_op = int(os.getenv("TORCH_NUM_THREADS", max(1, cores // torch_workers)))
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel op has run
+        pass
+    print(f"🧵 torch intra-op threads: {intra_op} ({cores} cores, {torch_workers} torch workers)")
+
+
+def pool_stats() -> List[dict]:
+    return [pool.stats() for pool in ALL_POOLS]
+
+
+def shutdown_all():
+    for pool in ALL_POOLS:
+        pool.shutdown()
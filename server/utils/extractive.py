@@ -0,0 +1,106 @@
+import os
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+EXTRACTIVE_SENTENCES = int(os.getenv("EXTRACTIVE_SENTENCES", "6"))
+# Sentences considered for ranking; longer documents are evenly sampled
+MAX_SENTENCES = 1500
+# Terms kept for TF-IDF (by document frequency)
+MAX_VOCABULARY = 2048
+DAMPING = 0.85
+ITERATIONS = 30
+REDUNDANCY_THRESHOLD = 0.7
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"])|\n{2,}")
+_TOKEN = re.compile(r"[a-z][a-z0-9'-]{2,}")
+_STOPWORDS = frozenset(
+    """the and for that this with shall will any all such which from its are been
+    has have not other may upon under into each party parties agreement hereof
+    hereunder herein thereof there their them than then were was being only also
+    made make more most must same said set forth following including without""".split()
+)
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text or "")]
+    return [" ".join(s.split()) for s in sentences if len(s.split()) >= 6]
+
+
+def _tfidf(sentences: List[str]) -> np.ndarray:
+    """
+    L2-normalized TF-IDF matrix (sentences x vocabulary). The vocabulary is
+    capped at the MAX_VOCABULARY terms found in the most sentences; rarer
+    terms hardly affect similarity and would make the dense matrix huge.
+    """
+    tokenized = [
+        Counter(t for t in _TOKEN.findall(s.lower()) if t not in _STOPWORDS) for s in sentences
+    ]
+    doc_freq = Counter(token for counts in tokenized for token in counts)
+    vocab = {token: col for col, (token, _) in enumerate(doc_freq.most_common(MAX_VOCABULARY))}
+
+    rows, cols, values = [], [], []
+    for row, counts in enumerate(tokenized):
+        for token, count in counts.items():
+            col = vocab.get(token)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+                values.append(count)
+    matrix = np.zeros((len(sentences), max(1, len(vocab))), dtype=np.float32)
+    matrix[rows, cols] = values
+
+    df = np.zeros(matrix.shape[1], dtype=np.float32)
+    df[: len(vocab)] = [doc_freq[token] for token in vocab]
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    matrix = np.log1p(matrix) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-8)
+
+
+def summarize(text: str, max_sentences: int = EXTRACTIVE_SENTENCES) -> str:
+    """
+    Extractive summary: rank sentences with TextRank over TF-IDF cosine
+    similarity, blended with closeness to the document centroid, and return
+    the top non-redundant sentences in document order. Pure NumPy; memory
+    is bounded by MAX_SENTENCES and MAX_VOCABULARY.
+    """
+    # Drop verbatim repeats (page headers, restated boilerplate)
+    sentences = list(dict.fromkeys(split_sentences(text)))
+    if not sentences:
+        return ""
+    if len(sentences) > MAX_SENTENCES:
+        keep = np.linspace(0, len(sentences) - 1, MAX_SENTENCES).astype(int)
+        sentences = [sentences[i] for i in keep]
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    vectors = _tfidf(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+
+    # TextRank: power iteration on the row-normalized similarity graph
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, row_sums, out=np.zeros_like(similarity), where=row_sums > 0)
+    n = len(sentences)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(ITERATIONS):
+        scores = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+
+    centroid = vectors.mean(axis=0)
+    centroid_score = vectors @ (centroid / max(np.linalg.norm(centroid), 1e-8))
+    combined = scores / max(scores.max(), 1e-8) + centroid_score / max(centroid_score.max(), 1e-8)
+
+    # Greedy pick by score, skipping sentences too similar to ones already chosen
+    chosen: List[int] = []
+    for idx in np.argsort(-combined):
+        if all(similarity[idx, other] < REDUNDANCY_THRESHOLD for other in chosen):
+            chosen.append(int(idx))
+            if len(chosen) == max_sentences:
+                break
+    return " ".join(sentences[i] for i in sorted(chosen))
@@ -0,0 +1,230 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from utils import executors
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# Any causal LM works; "sshleifer/tiny-gpt2" is enough to exercise the path on CPU
+HF_MODEL_ID = os.getenv("HF_MODEL_ID", "mistralai/Mistral-7B-v0.1")
+# Optional LoRA adapter (e.g. the mistral-7b-legal-lora from summary_inference.py)
+HF_ADAPTER_PATH = os.getenv("HF_ADAPTER_PATH", "")
+HF_MAX_BATCH = int(os.getenv("HF_MAX_BATCH", "8"))
+# How long the first prompt waits for others to join its batch
+HF_BATCH_WINDOW_MS = float(os.getenv("HF_BATCH_WINDOW_MS", "25"))
+HF_MAX_NEW_TOKENS = int(os.getenv("HF_MAX_NEW_TOKENS", "256"))
+HF_MAX_INPUT_TOKENS = int(os.getenv("HF_MAX_INPUT_TOKENS", "4096"))
+# Per-call deadline for the resilient caller; a CPU generate batch of a 7B
+# model can take several minutes, and a timed-out batch keeps running
+HF_CALL_TIMEOUT = float(os.getenv("HF_CALL_TIMEOUT", "900"))
+
+
+def model_name() -> str:
+    """Identifier of the in-process model, used in cache keys."""
+    return f"hf:{HF_MODEL_ID}" + (f"+{HF_ADAPTER_PATH}" if HF_ADAPTER_PATH else "")
+
+
+class _Request:
+    """One distinct prompt: its result future and how many callers await it."""
+
+    __slots__ = ("prompt", "future", "waiters")
+
+    def __init__(self, prompt: str, future: asyncio.Future):
+        self.prompt = prompt
+        self.future = future
+        self.waiters = 0
+
+
+class HFBatchedGenerator:
+    """
+    Local Hugging Face causal LM that batches concurrent prompts.
+    The first prompt opens a batch window of HF_BATCH_WINDOW_MS; every prompt
+    arriving before it closes (up to HF_MAX_BATCH) shares one left-padded
+    `generate` call on the generation executor.
+
+    A generate call cannot be interrupted, so a prompt that is already
+    queued or running is never submitted twice: a retry after a timeout
+    waits for the original result. Prompts nobody waits for any more are
+    dropped before their batch starts.
+    """
+
+    def __init__(self, model_id: str = HF_MODEL_ID, adapter_path: str = HF_ADAPTER_PATH,
+                 max_batch: int = HF_MAX_BATCH, window_ms: float = HF_BATCH_WINDOW_MS,
+                 max_new_tokens: int = HF_MAX_NEW_TOKENS):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self.max_new_tokens = max_new_tokens
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+        print(f"Loading HF summarizer model {model_id} on {self.device}...")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        # Left padding keeps every prompt's last token adjacent to generation
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        dtype = torch.float16 if self.device.type == "cuda" else torch.float32
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=dtype)
+        if adapter_path:
+            from peft import PeftModel
+            print(f"Merging adapter {adapter_path}...")
+            model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
+        self.model = model.to(self.device)
+        self.model.eval()
+
+        self._init_queue()
+
+    def _init_queue(self):
+        self._pending: List[_Request] = []
+        self._inflight: Dict[str, _Request] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Strong references: the loop only keeps weak ones to running tasks
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self.counters = {"prompts": 0, "joined": 0, "dropped": 0, "batches": 0,
+                         "generate_seconds": 0.0}
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=HF_MAX_INPUT_TOKENS,
+        ).to(self.device)
+        with self.torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        return self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._schedule_flush(immediate=len(self._pending) >= self.max_batch)
+        live = []
+        for request in batch:
+            if request.waiters > 0:
+                live.append(request)
+            else:
+                self.counters["dropped"] += 1
+                self._finish(request, exc=asyncio.CancelledError())
+        if not live:
+            return
+
+        start = time.perf_counter()
+        try:
+            texts = await executors.generation_executor.run(
+                self._generate_batch, [request.prompt for request in live],
+                priority=executors.BATCH, job_id="hf-summarizer",
+            )
+        except BaseException as exc:
+            for request in live:
+                self._finish(request, exc=exc)
+            raise
+        self.counters["batches"] += 1
+        self.counters["generate_seconds"] += time.perf_counter() - start
+        for request, text in zip(live, texts):
+            self._finish(request, text=text.strip())
+
+    def _finish(self, request: _Request, text: str = None, exc: BaseException = None):
+        if self._inflight.get(request.prompt) is request:
+            del self._inflight[request.prompt]
+        if request.future.done():
+            return
+        if exc is None:
+            request.future.set_result(text)
+        elif isinstance(exc, asyncio.CancelledError):
+            request.future.cancel()
+        else:
+            request.future.set_exception(exc)
+
+    def _start_flush(self):
+        task = asyncio.ensure_future(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ HF generate batch failed: {task.exception()!r}")
+
+    def _schedule_flush(self, immediate: bool = False):
+        loop = asyncio.get_running_loop()
+        if self._flush_handle is not None:
+            if not immediate:
+                return
+            self._flush_handle.cancel()
+        delay = 0 if immediate else self.window
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    async def generate(self, prompt: str) -> str:
+        request = self._inflight.get(prompt)
+        if request is None:
+            request = _Request(prompt, asyncio.get_running_loop().create_future())
+            self._inflight[prompt] = request
+            self._pending.append(request)
+            self.counters["prompts"] += 1
+            self._schedule_flush(immediate=len(self._pending) >= self.max_batch)
+        else:
+            self.counters["joined"] += 1
+        request.waiters += 1
+        try:
+            # Shielded: one caller giving up must not fail the others
+            return await asyncio.shield(request.future)
+        finally:
+            request.waiters -= 1
+
+    def stats(self) -> dict:
+        batches = self.counters["batches"]
+        return {
+            "backend": "hf",
+            "model": model_name(),
+            "device": str(self.device),
+            "queued": len(self._pending),
+            "max_batch": self.max_batch,
+            "batch_window_ms": self.window * 1000,
+            "prompts": self.counters["prompts"],
+            "joined": self.counters["joined"],
+            "dropped": self.counters["dropped"],
+            "running_batches": len(self._flush_tasks),
+            "batches": batches,
+            "avg_batch_size": round(self.counters["prompts"] / batches, 2) if batches else 0.0,
+            "generate_seconds": round(self.counters["generate_seconds"], 2),
+        }
+
+
+class HFBackendPool:
+    """
+    Drop-in replacement for llm_pool.BackendPool that renders each chain's
+    prompt and runs it on the in-process batched generator.
+    """
+
+    def __init__(self, generator: Optional[HFBatchedGenerator] = None):
+        self.generator = generator or HFBatchedGenerator()
+
+    async def ainvoke(self, chain, inputs: dict, backend=None) -> str:
+        # `backend` mirrors BackendPool's signature; there is only one model
+        return await self.generator.generate(chain.first.format(**inputs))
+
+    async def astream(self, chain, inputs: dict, backend=None):
+        # Batched generate returns whole completions; emit them as one chunk
+        yield await self.ainvoke(chain, inputs)
+
+    async def run_health_checks(self):
+        # Nothing to probe in-process
+        return
+
+    def stats(self) -> List[dict]:
+        return [self.generator.stats()]
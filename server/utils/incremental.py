@@ -0,0 +1,68 @@
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from utils.dedup import clause_hash
+
+UNCHANGED = "unchanged"
+MODIFIED = "modified"
+INSERTED = "inserted"
+DELETED = "deleted"
+
+
+def known_categories(previous_summaries: List[dict], other_hashes: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Normalized clause hash -> category from a previous job, including the
+    segments it classified as "Other" (which are not in its summaries).
+    """
+    known = {hash_: "Other" for hash_ in other_hashes or []}
+    for item in previous_summaries:
+        category = item.get("category")
+        if category and category != "Unknown":
+            known[clause_hash(item.get("original_text", ""))] = category
+    return known
+
+
+def align(previous_summaries: List[dict], clauses: List[dict]) -> Tuple[Dict[int, int], List[dict]]:
+    """
+    Align a new version's clauses to a previous job's clause summaries by
+    normalized text hash and a sequence diff (renumbering is ignored).
+
+    Returns (unchanged, change_map): `unchanged` maps new clause index ->
+    previous index for identical clauses; `change_map` lists every clause
+    as unchanged / modified (a replaced clause at the same position of an
+    edited block) / inserted / deleted, with old and new clause numbers.
+    """
+    old_hashes = [clause_hash(item.get("original_text", "")) for item in previous_summaries]
+    new_hashes = [clause_hash(clause.get("clause", "")) for clause in clauses]
+
+    def old_no(i: int) -> int:
+        return previous_summaries[i].get("clause_no", i + 1)
+
+    def new_no(j: int) -> int:
+        return clauses[j].get("clause_no", j + 1)
+
+    unchanged: Dict[int, int] = {}
+    change_map: List[dict] = []
+    matcher = SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                unchanged[j] = i
+                change_map.append({"change": UNCHANGED, "old_clause_no": old_no(i), "new_clause_no": new_no(j)})
+            continue
+        # Pair clauses position by position within an edited block
+        paired = min(i2 - i1, j2 - j1) if op == "replace" else 0
+        for k in range(paired):
+            change_map.append({"change": MODIFIED, "old_clause_no": old_no(i1 + k), "new_clause_no": new_no(j1 + k)})
+        for i in range(i1 + paired, i2):
+            change_map.append({"change": DELETED, "old_clause_no": old_no(i), "new_clause_no": None})
+        for j in range(j1 + paired, j2):
+            change_map.append({"change": INSERTED, "old_clause_no": None, "new_clause_no": new_no(j)})
+    return unchanged, change_map
+
+
+def change_counts(change_map: List[dict]) -> Dict[str, int]:
+    counts = {UNCHANGED: 0, MODIFIED: 0, INSERTED: 0, DELETED: 0}
+    for entry in change_map:
+        counts[entry["change"]] += 1
+    return counts
@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+from utils import executors
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# "budget": TTL + LRU eviction by collection count and bytes (default)
+# "on_complete": delete a collection as soon as no job uses it
+# "keep": never delete
+RAG_RETENTION = os.getenv("RAG_RETENTION", "budget").lower()
+RAG_INDEX_TTL_SECONDS = int(os.getenv("RAG_INDEX_TTL_SECONDS", str(7 * 24 * 3600)))
+RAG_MAX_COLLECTIONS = int(os.getenv("RAG_MAX_COLLECTIONS", "500"))
+RAG_MAX_BYTES = int(os.getenv("RAG_MAX_BYTES", str(5 * 1024 ** 3)))
+RAG_GC_INTERVAL = float(os.getenv("RAG_GC_INTERVAL", "3600"))
+
+
+def select_evictions(last_used: Dict[str, Optional[float]], total_bytes: int, now: float,
+                     ttl_seconds: int = RAG_INDEX_TTL_SECONDS,
+                     max_collections: int = RAG_MAX_COLLECTIONS,
+                     max_bytes: int = RAG_MAX_BYTES) -> List[str]:
+    """
+    Pick the collections to delete, least recently used first.
+    `last_used` maps doc id -> epoch seconds (None = never recorded, e.g.
+    collections from before usage tracking; those go first). Anything past
+    the TTL is evicted; then the LRU tail until both the collection count
+    and the estimated bytes (total / count per collection) fit the budget.
+    """
+    ordered = sorted(last_used, key=lambda doc_id: last_used[doc_id] or 0.0)
+    evict = [
+        doc_id for doc_id in ordered
+        if last_used[doc_id] is None or now - last_used[doc_id] > ttl_seconds
+    ]
+    expired = set(evict)
+    remaining = [doc_id for doc_id in ordered if doc_id not in expired]
+
+    count = len(last_used)
+    per_collection = total_bytes / count if count else 0
+    kept_bytes = per_collection * len(remaining)
+    over_count = len(remaining) - max_collections
+    over_bytes = math.ceil((kept_bytes - max_bytes) / per_collection) if kept_bytes > max_bytes else 0
+    return evict + remaining[: max(over_count, over_bytes, 0)]
+
+
+class IndexJanitor:
+    """
+    Tracks when each persistent RAG collection was last used (in MongoDB)
+    and periodically deletes collections according to RAG_RETENTION, then
+    compacts the Chroma store. Collections held by a running job are never
+    deleted. Errors are logged; a failed run is retried on the next one.
+    """
+
+    def __init__(self, rag, usage_collection=None):
+        self.rag = rag
+        self.usage = usage_collection
+        self.last_run: Optional[dict] = None
+
+    async def touch(self, doc_id: str):
+        if self.usage is None or not self.rag.PERSISTENT:
+            return
+        now = datetime.datetime.utcnow()
+        try:
+            await self.usage.update_one(
+                {"_id": doc_id},
+                {"$set": {"last_used_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
+        except Exception as exc:
+            print(f"⚠️ Could not record RAG index usage for {doc_id}: {exc}")
+
+    async def delete(self, doc_ids: List[str]) -> List[str]:
+        deleted = []
+        for doc_id in doc_ids:
+            try:
+                if await executors.embedding_executor.run(
+                    self.rag.delete_if_unused, doc_id, priority=executors.BACKGROUND
+                ):
+                    deleted.append(doc_id)
+            except Exception as exc:
+                print(f"⚠️ Could not delete RAG index {doc_id}: {exc}")
+        if deleted and self.usage is not None:
+            try:
+                await self.usage.delete_many({"_id": {"$in": deleted}})
+            except Exception as exc:
+                print(f"⚠️ Could not clear RAG index usage records: {exc}")
+        return deleted
+
+    async def on_released(self, doc_ids: List[str]):
+        """Called with the indexes a finished job was the last user of."""
+        if RAG_RETENTION == "on_complete" and self.rag.PERSISTENT:
+            await self.delete(doc_ids)
+
+    async def collect(self) -> dict:
+        """One GC pass: evict per policy, then compact if anything was deleted."""
+        start = time.perf_counter()
+        deleted: List[str] = []
+        if self.rag.PERSISTENT and RAG_RETENTION != "keep":
+            doc_ids = await executors.embedding_executor.run(
+                self.rag.list_indexes, priority=executors.BACKGROUND
+            )
+            before = await executors.embedding_executor.run(
+                self.rag.storage_stats, priority=executors.BACKGROUND
+            )
+            last_used: Dict[str, Optional[float]] = {doc_id: None for doc_id in doc_ids}
+            if self.usage is not None:
+                async for entry in self.usage.find({"_id": {"$in": doc_ids}}):
+                    used_at = entry.get("last_used_at")
+                    if used_at is not None:
+                        last_used[entry["_id"]] = used_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+            if RAG_RETENTION == "on_complete":
+                candidates = list(doc_ids)
+            else:
+                candidates = select_evictions(last_used, before["bytes"], time.time())
+            deleted = await self.delete(candidates)
+            if deleted:
+                try:
+                    await executors.embedding_executor.run(
+                        self.rag.compact, priority=executors.BACKGROUND
+                    )
+                except Exception as exc:
+                    print(f"⚠️ RAG store compaction skipped: {exc}")
+                print(f"🧹 RAG GC deleted {len(deleted)} collections")
+
+        self.last_run = {
+            "at": datetime.datetime.utcnow(),
+            "deleted": len(deleted),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        return self.last_run
+
+    async def run_forever(self, interval: float = RAG_GC_INTERVAL):
+        while True:
+            try:
+                await self.collect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"⚠️ RAG GC run failed: {exc}")
+            await asyncio.sleep(interval)
+
+    def policy(self) -> dict:
+        return {
+            "retention": RAG_RETENTION,
+            "ttl_seconds": RAG_INDEX_TTL_SECONDS,
+            "max_collections": RAG_MAX_COLLECTIONS,
+            "max_bytes": RAG_MAX_BYTES,
+            "interval_seconds": RAG_GC_INTERVAL,
+        }
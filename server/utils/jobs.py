@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict, Set
+
+# -----------------------------------------------------------------------------
+# In-process registry of running summarization jobs
+# -----------------------------------------------------------------------------
+TERMINAL_STATUSES = {"COMPLETED", "PARTIAL_FAILURE", "FAILED", "CANCELLED"}
+
+_tasks: Dict[str, asyncio.Task] = {}
+_cancel_requested: Set[str] = set()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation has been requested."""
+
+
+def register(job_id: str, task: asyncio.Task):
+    """Track the background task running `job_id` until it finishes."""
+    _tasks[job_id] = task
+
+    def _forget(_task):
+        if _tasks.get(job_id) is task:
+            del _tasks[job_id]
+        _cancel_requested.discard(job_id)
+
+    task.add_done_callback(_forget)
+
+
+def is_running(job_id: str) -> bool:
+    task = _tasks.get(job_id)
+    return task is not None and not task.done()
+
+
+def request_cancel(job_id: str) -> bool:
+    """
+    Flag `job_id` as cancelled and interrupt its task at the next await.
+    Returns True if the job was running in this process.
+    """
+    _cancel_requested.add(job_id)
+    task = _tasks.get(job_id)
+    if task is None or task.done():
+        _cancel_requested.discard(job_id)
+        return False
+    task.cancel()
+    return True
+
+
+def is_cancel_requested(job_id: str) -> bool:
+    return job_id in _cancel_requested
+
+
+async def cancel_tasks(*tasks: asyncio.Task):
+    """Cancel helper tasks (map-reduce, clause batches) and wait for them to unwind."""
+    pending = [t for t in tasks if t is not None and not t.done()]
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
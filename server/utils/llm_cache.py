@@ -0,0 +1,116 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def make_key(kind: str, parts: Tuple[str, ...], versions: Tuple[str, ...]) -> str:
+    """Stable content key over the call kind, its inputs and the model/prompt versions."""
+    payload = json.dumps([kind, list(parts), list(versions)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Two-level cache for LLM outputs: an in-process LRU in front of a MongoDB
+    collection. Entries expire after `ttl_seconds` in both levels (Mongo
+    removes them through a TTL index on `expires_at`).
+    Cache errors are logged and treated as misses; they never fail a job.
+    """
+
+    def __init__(self, collection=None, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, outcome: str):
+        kind_counters = self.counters.setdefault(kind, {"memory_hits": 0, "db_hits": 0, "misses": 0})
+        kind_counters[outcome] += 1
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get(self, kind: str, key: str) -> Optional[str]:
+        entry = self._lru.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._lru.move_to_end(key)
+                self._count(kind, "memory_hits")
+                return value
+            del self._lru[key]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.datetime.utcnow()}},
+                    {"value": 1, "expires_at": 1},
+                )
+            except Exception as exc:
+                print(f"⚠️ LLM cache lookup failed: {exc}")
+                doc = None
+            if doc:
+                expires_at = doc["expires_at"].replace(tzinfo=datetime.timezone.utc).timestamp()
+                self._remember(key, doc["value"], expires_at)
+                self._count(kind, "db_hits")
+                return doc["value"]
+
+        self._count(kind, "misses")
+        return None
+
+    async def set(self, kind: str, key: str, value: str):
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl_seconds)
+        self._remember(key, value, time.time() + self.ttl_seconds)
+        if self.collection is None:
+            return
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {
+                    "$set": {
+                        "kind": kind,
+                        "value": value,
+                        "expires_at": expires_at,
+                        "updated_at": datetime.datetime.utcnow(),
+                    }
+                },
+                upsert=True,
+            )
+        except Exception as exc:
+            print(f"⚠️ LLM cache write failed: {exc}")
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def stats(self) -> dict:
+        totals = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+        for kind_counters in self.counters.values():
+            for outcome, count in kind_counters.items():
+                totals[outcome] += count
+        lookups = sum(totals.values())
+        return {
+            "enabled": True,
+            "memory_entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "totals": totals,
+            "hit_rate": round((totals["memory_hits"] + totals["db_hits"]) / lookups, 3) if lookups else 0.0,
+            "by_kind": self.counters,
+        }
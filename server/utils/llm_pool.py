@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from utils.llm_resilience import is_transient
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx ships with the ollama client
+    httpx = None
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# Comma-separated list of Ollama servers; falls back to OLLAMA_BASE_URL
+OLLAMA_BASE_URLS = [
+    url.strip().rstrip("/")
+    for url in os.getenv(
+        "OLLAMA_BASE_URLS", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    ).split(",")
+    if url.strip()
+]
+BACKEND_MAX_INFLIGHT = int(os.getenv("OLLAMA_BACKEND_MAX_INFLIGHT", "4"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_CHECK_TIMEOUT", "5"))
+# Consecutive failures before a backend is ejected, and for how long
+EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+EWMA_ALPHA = 0.2
+# Latency assumed for a backend before it has served anything
+DEFAULT_LATENCY = 5.0
+
+
+class NoHealthyBackend(ConnectionError):
+    """Raised when every backend is down or ejected (treated as transient)."""
+
+
+class Backend:
+    """One Ollama server: its LLM client plus load and health bookkeeping."""
+
+    def __init__(self, url: str, llm, max_inflight: int = BACKEND_MAX_INFLIGHT):
+        self.url = url
+        self.llm = llm
+        self.max_inflight = max(1, max_inflight)
+        self.inflight = 0
+        self.latency_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.healthy = True
+        self.served = 0
+        self._chains: Dict[int, object] = {}
+
+    def is_available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.ejected_until
+
+    def score(self) -> float:
+        # Expected wait: queue depth (including this call) x typical latency
+        return (self.inflight + 1) * (self.latency_ewma or DEFAULT_LATENCY)
+
+    def chain_for(self, chain):
+        """Re-bind a prompt | llm | parser chain to this backend's LLM."""
+        key = id(chain)
+        if key not in self._chains:
+            self._chains[key] = chain.first | self.llm | chain.last
+        return self._chains[key]
+
+    def record_success(self, seconds: float):
+        self.served += 1
+        self.consecutive_failures = 0
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency_ewma
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= EJECT_AFTER_FAILURES:
+            self.ejected_until = time.monotonic() + EJECT_SECONDS
+            print(f"⛔ Ejecting Ollama backend {self.url} for {EJECT_SECONDS}s "
+                  f"after {self.consecutive_failures} failures")
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma else None,
+            "consecutive_failures": self.consecutive_failures,
+            "served": self.served,
+        }
+
+
+class BackendPool:
+    """
+    Routes each LLM call to the least-loaded healthy backend (in-flight count
+    x latency EWMA), honouring per-backend concurrency caps. Backends that
+    fail repeatedly are ejected for a while; a background task probes
+    `/api/tags` to mark servers up or down.
+
+    Callers that time their calls (ResilientCaller) lease a backend with
+    `acquire()` first and pass it to `ainvoke`/`astream`, so time spent
+    waiting for a free slot is never counted as backend latency.
+    """
+
+    def __init__(self, urls: List[str], make_llm: Callable[[str], object],
+                 max_inflight: int = BACKEND_MAX_INFLIGHT):
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required")
+        self.backends = [Backend(url, make_llm(url), max_inflight) for url in urls]
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def try_acquire(self) -> Optional[Backend]:
+        """Lease the best free backend, or None if every healthy one is busy."""
+        available = [b for b in self.backends if b.is_available()]
+        if not available:
+            raise NoHealthyBackend("No healthy Ollama backend available")
+        free = [b for b in available if b.inflight < b.max_inflight]
+        if not free:
+            return None
+        backend = min(free, key=lambda b: b.score())
+        backend.inflight += 1
+        return backend
+
+    async def acquire(self) -> Backend:
+        """Wait for a free slot on a healthy backend; pair with release()."""
+        while True:
+            backend = self.try_acquire()
+            if backend is not None:
+                return backend
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken just as we were cancelled; pass the wake-up on
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self, backend: Backend):
+        backend.inflight -= 1
+        self._wake()
+
+    def _wake(self, everyone: bool = False):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                if not everyone:
+                    return
+
+    async def ainvoke(self, chain, inputs: dict, backend: Optional[Backend] = None):
+        """Run the chain on `backend` (a lease from acquire()) or on any free backend."""
+        if backend is None:
+            backend = await self.acquire()
+            try:
+                return await self._ainvoke(backend, chain, inputs)
+            finally:
+                self.release(backend)
+        return await self._ainvoke(backend, chain, inputs)
+
+    async def _ainvoke(self, backend: Backend, chain, inputs: dict):
+        start = time.monotonic()
+        try:
+            result = await backend.chain_for(chain).ainvoke(inputs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if is_transient(exc):
+                backend.record_failure()
+            raise
+        backend.record_success(time.monotonic() - start)
+        return result
+
+    async def astream(self, chain, inputs: dict, backend: Optional[Backend] = None):
+        """Like ainvoke, but yields output chunks as the backend produces them."""
+        leased = backend is None
+        if leased:
+            backend = await self.acquire()
+        start = time.monotonic()
+        try:
+            async for chunk in backend.chain_for(chain).astream(inputs):
+                yield chunk
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if is_transient(exc):
+                backend.record_failure()
+            raise
+        else:
+            backend.record_success(time.monotonic() - start)
+        finally:
+            if leased:
+                self.release(backend)
+
+    async def probe(self, backend: Backend) -> bool:
+        if httpx is None:
+            return backend.healthy
+        try:
+            async with httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT) as client:
+                response = await client.get(f"{backend.url}/api/tags")
+            healthy = response.status_code == 200
+        except Exception:
+            healthy = False
+        if healthy and not backend.healthy:
+            print(f"✅ Ollama backend {backend.url} is back")
+            backend.consecutive_failures = 0
+            backend.ejected_until = 0.0
+        elif not healthy and backend.healthy:
+            print(f"⚠️ Ollama backend {backend.url} failed its health check")
+        backend.healthy = healthy
+        return healthy
+
+    async def run_health_checks(self, interval: float = HEALTH_CHECK_INTERVAL):
+        while True:
+            await asyncio.gather(*[self.probe(b) for b in self.backends])
+            # Backends may have come back (or all gone): let waiters re-check
+            self._wake(everyone=True)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> List[dict]:
+        return [b.stats() for b in self.backends]
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "15"))
+# Hedging: fire a duplicate request once a call outlives the observed percentile
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Circuit breaker: open after N consecutive transient failures, for M seconds
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx ships with the ollama client
+    httpx = None
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Errors worth retrying: timeouts, connection problems, 429 and 5xx."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True
+    if httpx is not None:
+        if isinstance(exc, httpx.TransportError):
+            return True
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code == 429 or exc.response.status_code >= 500
+    # ollama.ResponseError and similar expose the HTTP status as status_code
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `cooldown`."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        # Half-open lets calls through; the first result closes or re-opens it
+        return self.state != "open"
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.threshold:
+            if self.state != "open":
+                print(f"🔌 LLM circuit breaker opened for {self.cooldown}s")
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[rank]
+
+
+class ResilientCaller:
+    """
+    Wraps LLM calls with a per-call deadline, jittered exponential retry for
+    transient errors, optional hedged requests and a circuit breaker.
+    `make_call(slot)` must create a fresh awaitable on every invocation.
+
+    With `slots` (an object with acquire/try_acquire/release, e.g. a
+    BackendPool) every attempt first waits for a slot and only then starts
+    its deadline and hedge timers, so queueing behind our own concurrency
+    caps never counts as a backend timeout. Without it `slot` is None.
+    """
+
+    def __init__(self, name: str = "llm", timeout: float = LLM_CALL_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, hedge: bool = LLM_HEDGE_ENABLED,
+                 slots: Any = None):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.slots = slots
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.counters = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0,
+                         "hedge_wins": 0, "hedges_skipped": 0, "failures": 0,
+                         "rejected_open": 0}
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        delay = self.latency.percentile(LLM_HEDGE_PERCENTILE)
+        return delay if delay is not None and delay < self.timeout else None
+
+    def _launch(self, make_call: Callable[[Any], Awaitable[T]], slot: Any) -> asyncio.Future:
+        """Start one call; its slot is released when the call actually finishes."""
+        try:
+            task = asyncio.ensure_future(make_call(slot))
+        except BaseException:
+            if slot is not None:
+                self.slots.release(slot)
+            raise
+        if slot is not None:
+            task.add_done_callback(lambda _task: self.slots.release(slot))
+        return task
+
+    async def _attempt(self, make_call: Callable[[Any], Awaitable[T]], hedge: bool) -> T:
+        # Waiting for a slot happens before any timer starts
+        slot = await self.slots.acquire() if self.slots is not None else None
+        start = time.monotonic()
+        deadline = start + self.timeout
+        primary = self._launch(make_call, slot)
+        tasks = {primary}
+        try:
+            hedge_delay = self._hedge_delay() if hedge else None
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    hedge_slot = None
+                    if self.slots is not None:
+                        try:
+                            hedge_slot = self.slots.try_acquire()
+                        except Exception:
+                            pass  # no healthy backend left; the primary keeps going
+                    if self.slots is not None and hedge_slot is None:
+                        # Every backend is busy: a duplicate would only queue
+                        self.counters["hedges_skipped"] += 1
+                    else:
+                        self.counters["hedges"] += 1
+                        tasks.add(self._launch(make_call, hedge_slot))
+
+            last_exc: Optional[BaseException] = None
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - start)
+                        if task is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    last_exc = task.exception()
+            if last_exc is not None and not tasks:
+                raise last_exc
+            self.counters["timeouts"] += 1
+            raise asyncio.TimeoutError(f"{self.name} call exceeded {self.timeout}s")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, make_call: Callable[[Any], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Run `make_call(slot)` with deadline/retry/breaker protection.
+        Pass hedge=False for calls with side effects (e.g. streaming output).
+        """
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.counters["rejected_open"] += 1
+                raise CircuitOpenError(f"{self.name} backend unavailable (circuit open)")
+            try:
+                result = await self._attempt(make_call, hedge)
+                self.breaker.record_success()
+                return result
+            except Exception as exc:
+                if not is_transient(exc):
+                    self.counters["failures"] += 1
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                # Full jitter: sleep uniformly in [0, base * 2^attempt], capped
+                delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                self.counters["retries"] += 1
+                print(f"🔁 {self.name} transient error ({type(exc).__name__}: {exc}); retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "p50_latency": self.latency.percentile(50),
+            "p95_latency": self.latency.percentile(95),
+            "hedging": self.hedge,
+            **self.counters,
+        }
@@ -4,7 +4,13 @@ import pdfplumber
 import json
 from transformers import AutoTokenizer, AutoModelForTokenClassification
 
+import os
+
+from utils.dedup import clause_hash
+
 MODEL_PATH = "../models/fine-tuned-legalbert"
+# Identifies the classifier in stored results; bump it when the model changes
+CLAUSE_MODEL_VERSION = os.getenv("CLAUSE_MODEL_VERSION", "legalbert-ft-v1")
 
 print("Loading model and tokenizer...")
 tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
@@ -23,11 +29,26 @@ def extract_pdf_text(pdf_path):
                 text += page_text + "\n"
     return text.strip()
 
+# Split on paragraph breaks or periods followed by uppercase letters
+CLAUSE_BREAK = re.compile(r'\n{2,}|(?<=\.)\s+(?=[A-Z])')
+
+def split_into_clauses_with_offsets(text):
+    """(clause, start, end) for each clause; offsets index into `text`."""
+    spans = []
+    pos = 0
+    for match in list(CLAUSE_BREAK.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        piece = text[pos:end]
+        clause = piece.strip()
+        if len(clause) > 20:
+            start = pos + len(piece) - len(piece.lstrip())
+            spans.append((clause, start, start + len(clause)))
+        if match:
+            pos = match.end()
+    return spans
+
 def split_into_clauses(text):
-    # Split on paragraph breaks or periods followed by uppercase letters
-    clauses = re.split(r'\n{2,}|(?<=\.)\s+(?=[A-Z])', text)
-    clauses = [c.strip() for c in clauses if len(c.strip()) > 20]
-    return clauses
+    return [clause for clause, _, _ in split_into_clauses_with_offsets(text)]
 
 def classify_clauses(clauses, batch_size=8):
     all_preds = []
@@ -51,22 +72,44 @@ def classify_clauses(clauses, batch_size=8):
     return all_preds
 
 def predict_clauses(pdf_path):
+    return predict_clauses_incremental(pdf_path)[0]
+
+def predict_clauses_incremental(pdf_path, known=None):
+    """
+    Like predict_clauses, but segments whose normalized hash is in `known`
+    (hash -> category, "Other" included) reuse that category instead of
+    being classified again.
+    Returns (results, hashes of segments classified "Other", number classified).
+    """
     import time
     start = time.time()
+    known = known or {}
 
     print(f"\\nProcessing PDF: {pdf_path}")
     text = extract_pdf_text(pdf_path)
     print(f"Text extraction done in {round(time.time() - start, 2)}s")
 
-    clauses = split_into_clauses(text)
+    spans = split_into_clauses_with_offsets(text)
+    clauses = [clause for clause, _, _ in spans]
     print(f"Found {len(clauses)} clauses to classify")
 
     classify_start = time.time()
-    categories = classify_clauses(clauses)
-    print(f"Classification done in {round(time.time() - classify_start, 2)}s")
+    hashes = [clause_hash(clause) for clause in clauses]
+    categories = [known.get(hash_) for hash_ in hashes]
+    todo = [i for i, category in enumerate(categories) if category is None]
+    for i, category in zip(todo, classify_clauses([clauses[i] for i in todo])):
+        categories[i] = category
+    print(f"Classification of {len(todo)}/{len(clauses)} clauses done in {round(time.time() - classify_start, 2)}s")
+    other_hashes = sorted({hashes[i] for i, category in enumerate(categories) if category == "Other"})
 
     results = [
-        {"clause_no": i + 1, "category": categories[i], "clause": clauses[i]}
+        {
+            "clause_no": i + 1,
+            "category": categories[i],
+            "clause": clauses[i],
+            "start": spans[i][1],
+            "end": spans[i][2],
+        }
         for i in range(len(clauses))
     ]
 
@@ -84,4 +127,4 @@ def predict_clauses(pdf_path):
         serializable_results = json.loads(json.dumps(useful_results, default=str))
 
     print(f"�o. Total processing time: {round(time.time() - start, 2)}s\\n")
-    return serializable_results
+    return serializable_results, other_hashes, len(todo)
@@ -1,35 +1,199 @@
+import base64
 import os
+import re
+import threading
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.embedding_cache import CachedEmbeddings, EmbeddingStore, EMBEDDING_CACHE_ENABLED
+
+# Indexes are addressed by document content (file hash), so every job over
+# the same PDF shares one index.
+# "memory": NumPy index, dropped when the last job using it finishes (default)
+# "chroma": persistent Chroma collections in VECTOR_DB_DIR
+RAG_BACKEND = os.getenv("RAG_BACKEND", "memory").lower()
+PERSISTENT = RAG_BACKEND == "chroma"
+RAG_TOP_K = 3
+# Rows of the clause x clause similarity matrix computed at once
+NEIGHBOR_BLOCK_ROWS = 1024
+
+if PERSISTENT:
+    from langchain_chroma import Chroma
 
 # 1. Setup Embeddings (We use a small, fast local model)
 # "all-MiniLM-L6-v2" is standard, fast, and runs on CPU.
-embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+EMBEDDING_MODEL_ID = "all-MiniLM-L6-v2"
+# Repeated clause texts (recurring templates) are served from a persistent cache
+embedding_function = CachedEmbeddings(
+    HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_ID),
+    EMBEDDING_MODEL_ID,
+    EmbeddingStore() if EMBEDDING_CACHE_ENABLED else None,
+)
 
-# 2. Initialize Vector DB (Chroma)
+# 2. Persistent Vector DB (Chroma, RAG_BACKEND=chroma)
 # We use a persistent directory so data survives server restarts
 VECTOR_DB_DIR = "./chroma_db"
 
 
-def index_document(doc_id: str, clauses: list):
+class InMemoryVectorIndex:
     """
-    Takes the extracted clauses and saves them into the Vector DB.
+    Clause embeddings for one document as a row-normalized float32 matrix.
+    Cosine similarity is a single matmul; top-k uses argpartition.
     """
-    vectorstore = Chroma(
-        collection_name=f"doc_{doc_id}",
-        embedding_function=embedding_function,
-        persist_directory=VECTOR_DB_DIR
-    )
-    
-    # Convert your clauses dict to LangChain Documents
+
+    def __init__(self, docs: List[Document], vectors: np.ndarray):
+        self.docs = docs
+        self.matrix = _normalize(vectors)
+
+    def search(self, query_vector: np.ndarray, k: int = RAG_TOP_K) -> List[Tuple[Document, float]]:
+        if not self.docs:
+            return []
+        scores = self.matrix @ _normalize(query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.docs[i], float(scores[i])) for i in top]
+
+
+class InMemoryRetriever(BaseRetriever):
+    """Retriever interface over an InMemoryVectorIndex."""
+
+    index: InMemoryVectorIndex
+    k: int = RAG_TOP_K
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query_vector = np.asarray(embedding_function.embed_query(query), dtype=np.float32)
+        return [doc for doc, _ in self.index.search(query_vector, self.k)]
+
+
+_memory_indexes: Dict[str, InMemoryVectorIndex] = {}
+# Jobs currently using each index (both backends)
+_holders: Dict[str, Set[str]] = {}
+_index_lock = threading.Lock()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+def _to_documents(clauses: list, positions: List[int] = None) -> List[Document]:
+    """`positions` are the clauses' indices in the full document (default: 0..n-1)."""
+    if positions is None:
+        positions = range(len(clauses))
     docs = []
-    for item in clauses:
+    for position, item in zip(positions, clauses):
         text = item.get("clause", "")
         # Add metadata so we know where this text came from
-        meta = {"clause_no": item.get("clause_no"), "category": item.get("category")}
+        meta = {"clause_no": item.get("clause_no"), "category": item.get("category"), "position": position}
         docs.append(Document(page_content=text, metadata=meta))
-    
+    return docs
+
+
+def _neighbor_lists(docs: List[Document], vectors: np.ndarray, k: int) -> List[List[Document]]:
+    """
+    Top-k most similar docs for every doc, excluding itself and the clauses
+    directly before/after it in the document (already given to the prompt
+    as PREV/NEXT). Adjacency uses each doc's "position" metadata, i.e. its
+    index in the full clause list, not its row in the deduplicated index.
+    """
+    n = len(docs)
+    if n == 0:
+        return []
+    matrix = _normalize(vectors)
+    positions = np.array(
+        [doc.metadata.get("position", row) for row, doc in enumerate(docs)], dtype=np.int64
+    )
+    k = min(k, n)
+    neighbors: List[List[Document]] = []
+    for start in range(0, n, NEIGHBOR_BLOCK_ROWS):
+        rows = np.arange(start, min(start + NEIGHBOR_BLOCK_ROWS, n))
+        scores = matrix[rows] @ matrix.T
+        adjacent = np.abs(positions[rows][:, None] - positions[None, :]) <= 1
+        scores[adjacent] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for cols, col_scores in zip(top, top_scores):
+            neighbors.append([docs[c] for c, score in zip(cols, col_scores) if np.isfinite(score)])
+    return neighbors
+
+
+# Chroma collection names are limited to 63 characters, so 64-hex file
+# hashes are stored base32-encoded (52 chars) under their own prefix
+_HASH_PREFIX = "doch_"
+_PLAIN_PREFIX = "doc_"
+_HEX64 = re.compile(r"[0-9a-f]{64}")
+
+
+def collection_name(doc_id: str) -> str:
+    if _HEX64.fullmatch(doc_id):
+        return _HASH_PREFIX + base64.b32encode(bytes.fromhex(doc_id)).decode().rstrip("=").lower()
+    return _PLAIN_PREFIX + doc_id
+
+
+def doc_id_for(name: str):
+    """Inverse of collection_name; None for collections that are not ours."""
+    if name.startswith(_HASH_PREFIX):
+        encoded = name[len(_HASH_PREFIX):].upper()
+        return base64.b32decode(encoded + "=" * (-len(encoded) % 8)).hex()
+    if name.startswith(_PLAIN_PREFIX):
+        return name[len(_PLAIN_PREFIX):]
+    return None
+
+
+def _chroma(doc_id: str):
+    return Chroma(
+        collection_name=collection_name(doc_id),
+        embedding_function=embedding_function,
+        persist_directory=VECTOR_DB_DIR
+    )
+
+
+def index_document(doc_id: str, clauses: list, holder: str = None, positions: List[int] = None):
+    """
+    Takes the extracted clauses and saves them into the Vector DB.
+    An existing index for `doc_id` is reused as is. `holder` (e.g. a job id)
+    keeps an in-memory index alive until release(holder). `positions` gives
+    each clause's index in the full document when `clauses` is a subset
+    (e.g. after dedup).
+    """
+    docs = _to_documents(clauses, positions)
+    if not PERSISTENT:
+        with _index_lock:
+            index = _memory_indexes.get(doc_id)
+            if index is not None:
+                _holders.setdefault(doc_id, set()).add(holder or doc_id)
+                print(f"♻️ Reusing in-memory RAG index (Doc ID: {doc_id})")
+                return index
+        vectors = (
+            embedding_function.embed_documents([doc.page_content for doc in docs])
+            if docs else np.zeros((0, 1), dtype=np.float32)
+        )
+        index = InMemoryVectorIndex(docs, vectors)
+        with _index_lock:
+            # A concurrent job may have built the same index meanwhile
+            index = _memory_indexes.setdefault(doc_id, index)
+            _holders.setdefault(doc_id, set()).add(holder or doc_id)
+        print(f"✅ Indexed {len(docs)} clauses for RAG in memory (Doc ID: {doc_id})")
+        return index
+
+    with _index_lock:
+        _holders.setdefault(doc_id, set()).add(holder or doc_id)
+    vectorstore = _chroma(doc_id)
+    if vectorstore.get(limit=1)["ids"]:
+        print(f"♻️ Reusing RAG collection (Doc ID: {doc_id})")
+        return vectorstore
     # Add to database
     if docs:
         vectorstore.add_documents(docs)
@@ -38,16 +202,159 @@ def index_document(doc_id: str, clauses: list):
     return vectorstore
 
 
+def release(holder: str) -> List[str]:
+    """
+    Drop `holder`'s claim on its indexes. In-memory indexes nobody holds are
+    freed; persistent collections are kept (see utils/index_gc.py).
+    Returns the doc ids that are no longer held by anyone.
+    """
+    unheld = []
+    with _index_lock:
+        for doc_id in [d for d, holders in _holders.items() if holder in holders]:
+            holders = _holders[doc_id]
+            holders.discard(holder)
+            if not holders:
+                del _holders[doc_id]
+                unheld.append(doc_id)
+                if _memory_indexes.pop(doc_id, None) is not None:
+                    print(f"🗑️ Released in-memory RAG index (Doc ID: {doc_id})")
+    return unheld
+
+
 def get_retriever(doc_id: str):
     """
     Returns a tool that lets you search this specific document.
     """
-    vectorstore = Chroma(
-        collection_name=f"doc_{doc_id}",
-        embedding_function=embedding_function,
-        persist_directory=VECTOR_DB_DIR
-    )
+    if not PERSISTENT:
+        with _index_lock:
+            index = _memory_indexes.get(doc_id)
+        if index is None:
+            raise KeyError(f"No in-memory RAG index for doc {doc_id}")
+        return InMemoryRetriever(index=index, k=RAG_TOP_K)
+
     # Search for top 3 most relevant chunks
-    return vectorstore.as_retriever(search_kwargs={"k": 3})
+    return _chroma(doc_id).as_retriever(search_kwargs={"k": RAG_TOP_K})
+
+
+def precompute_neighbors(doc_id: str, k: int = RAG_TOP_K) -> List[List[Document]]:
+    """
+    RAG context for every indexed clause in one batched similarity pass over
+    the stored embeddings, instead of one embed + search per clause.
+    Returns one list of related Documents per clause, in indexing order.
+    """
+    if not PERSISTENT:
+        with _index_lock:
+            index = _memory_indexes.get(doc_id)
+        if index is None:
+            raise KeyError(f"No in-memory RAG index for doc {doc_id}")
+        return _neighbor_lists(index.docs, index.matrix, k)
 
+    stored = _chroma(doc_id).get(include=["embeddings", "documents", "metadatas"])
+    rows = sorted(
+        zip(stored["metadatas"], stored["documents"], stored["embeddings"]),
+        key=lambda row: (row[0] or {}).get("position", (row[0] or {}).get("clause_no") or 0),
+    )
+    docs = [Document(page_content=text, metadata=meta or {}) for meta, text, _ in rows]
+    vectors = np.asarray([vector for _, _, vector in rows], dtype=np.float32)
+    return _neighbor_lists(docs, vectors, k)
 
+
+def index_exists(doc_id: str) -> bool:
+    """
+    True if this document already has clauses in the Vector DB.
+    """
+    if not PERSISTENT:
+        with _index_lock:
+            return doc_id in _memory_indexes
+    return bool(_chroma(doc_id).get(limit=1)["ids"])
+
+
+def delete_index(doc_id: str):
+    """
+    Drops the vector collection for this document, if it exists.
+    """
+    if not PERSISTENT:
+        with _index_lock:
+            _holders.pop(doc_id, None)
+            if _memory_indexes.pop(doc_id, None) is None:
+                return
+    else:
+        _chroma(doc_id).delete_collection()
+    print(f"🗑️ Deleted RAG index (Doc ID: {doc_id})")
+
+
+def delete_if_unused(doc_id: str) -> bool:
+    """
+    Delete the index unless a job holds it. The check and the delete happen
+    under the index lock, so a job starting concurrently cannot lose it.
+    """
+    with _index_lock:
+        if _holders.get(doc_id):
+            return False
+        if not PERSISTENT:
+            _memory_indexes.pop(doc_id, None)
+        else:
+            _chroma(doc_id).delete_collection()
+    print(f"🗑️ Deleted RAG index (Doc ID: {doc_id})")
+    return True
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def list_indexes() -> List[str]:
+    """Doc ids of every stored index."""
+    if not PERSISTENT:
+        with _index_lock:
+            return list(_memory_indexes)
+    import chromadb
+    client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
+    # Older chromadb returns Collection objects, newer ones plain names
+    names = [getattr(c, "name", c) for c in client.list_collections()]
+    doc_ids = [doc_id_for(name) for name in names]
+    return [doc_id for doc_id in doc_ids if doc_id is not None]
+
+
+def storage_stats() -> dict:
+    """Index count and bytes used by the configured backend."""
+    if not PERSISTENT:
+        with _index_lock:
+            return {
+                "backend": RAG_BACKEND,
+                "indexes": len(_memory_indexes),
+                "in_use": len(_holders),
+                "bytes": sum(index.matrix.nbytes for index in _memory_indexes.values()),
+            }
+    return {
+        "backend": RAG_BACKEND,
+        "indexes": len(list_indexes()),
+        "in_use": len(_holders),
+        "bytes": _dir_bytes(VECTOR_DB_DIR),
+        "path": VECTOR_DB_DIR,
+    }
+
+
+def compact():
+    """
+    Reclaim space left by deleted collections (SQLite keeps freed pages
+    until VACUUM). Safe to skip: a locked database is retried next run.
+    """
+    if not PERSISTENT:
+        return
+    import sqlite3
+    db_path = os.path.join(VECTOR_DB_DIR, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
@@ -0,0 +1,80 @@
+import asyncio
+import os
+from typing import Dict, Optional
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# Seconds a finished stream stays readable for late or reconnecting clients
+STREAM_LINGER_SECONDS = float(os.getenv("STREAM_LINGER_SECONDS", "120"))
+
+
+class SummaryStream:
+    """
+    Append-only text buffer for one job's executive summary as it is generated.
+    Readers follow it by character offset, so a reconnecting client resumes
+    where it left off. `reset()` discards the text (the LLM call was retried);
+    readers see the generation counter change and start again from 0.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.generation = 0
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def write(self, delta: str):
+        if delta:
+            self.text += delta
+            self._notify()
+
+    def reset(self):
+        self.text = ""
+        self.generation += 1
+        self._notify()
+
+    def finish(self, final_text: Optional[str] = None):
+        if final_text is not None and final_text != self.text:
+            # The final text differs (e.g. fallback summary); replace it
+            self.text = final_text
+            self.generation += 1
+        self.done = True
+        self._notify()
+
+    async def wait_for_change(self, timeout: float):
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+_streams: Dict[str, SummaryStream] = {}
+
+
+def open_stream(job_id: str) -> SummaryStream:
+    stream = SummaryStream()
+    _streams[job_id] = stream
+    return stream
+
+
+def get_stream(job_id: str) -> Optional[SummaryStream]:
+    return _streams.get(job_id)
+
+
+def close_stream(job_id: str, final_text: Optional[str] = None):
+    """Finish the job's stream and drop it after STREAM_LINGER_SECONDS."""
+    stream = _streams.get(job_id)
+    if stream is None:
+        return
+    stream.finish(final_text)
+
+    def _drop():
+        if _streams.get(job_id) is stream:
+            del _streams[job_id]
+
+    asyncio.get_running_loop().call_later(STREAM_LINGER_SECONDS, _drop)
@@ -1,27 +1,93 @@
+import asyncio
+import contextvars
+import json
 import os
-from typing import List, Tuple, Optional
+import re
+from typing import Any, Dict, List, Tuple, Optional
 
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.retrievers import BaseRetriever
 from langchain_ollama import ChatOllama
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from utils.llm_cache import SummaryCache, make_key
+from utils.llm_pool import OLLAMA_BASE_URLS, BackendPool
+from utils.llm_resilience import ResilientCaller
+
 # -----------------------------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------------------------
 MODEL_VERSION = os.getenv("LLM_MODEL_VERSION", "llama3-legal-v1")
 PROMPT_VERSION = os.getenv("LLM_PROMPT_VERSION", "v3.0-map-reduce")
+# Map-phase chunks summarized concurrently; per-chunk timeout in seconds (0 = none)
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+MAP_CHUNK_TIMEOUT = float(os.getenv("MAP_CHUNK_TIMEOUT", "0"))
+# Token budgets for map-reduce (must leave room for prompt + output in NUM_CTX)
+NUM_CTX = int(os.getenv("LLM_NUM_CTX", "8192"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "2500"))
+MAP_CHUNK_OVERLAP_TOKENS = int(os.getenv("MAP_CHUNK_OVERLAP_TOKENS", "100"))
+REDUCE_TOKEN_BUDGET = int(os.getenv("REDUCE_TOKEN_BUDGET", "5000"))
+# Optional HF tokenizer used for counting; falls back to ~4 chars per token
+SUMMARY_TOKENIZER = os.getenv("SUMMARY_TOKENIZER", "")
+# "single": one LLM call per clause; "batched": CLAUSES_PER_PROMPT clauses per call
+CLAUSE_SUMMARY_MODE = os.getenv("CLAUSE_SUMMARY_MODE", "single")
+CLAUSES_PER_PROMPT = int(os.getenv("CLAUSES_PER_PROMPT", "5"))
+# "ollama": remote Ollama servers; "hf": in-process batched Hugging Face model
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "ollama").lower()
 
 # -----------------------------------------------------------------------------
 # LLM Client
 # -----------------------------------------------------------------------------
-llm = ChatOllama(
-    model=os.getenv("LLM_MODEL_NAME", "llama3"),
-    temperature=0.1,
-    base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-    num_ctx=8192 # Ensure context window is large enough for chunks
-)
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "llama3")
+
+
+def _make_llm(base_url: str) -> ChatOllama:
+    return ChatOllama(
+        model=LLM_MODEL_NAME,
+        temperature=0.1,
+        base_url=base_url,
+        num_ctx=NUM_CTX # Ensure context window is large enough for chunks
+    )
+
+if SUMMARIZER_BACKEND == "hf":
+    from utils.hf_backend import HF_CALL_TIMEOUT, HFBackendPool, model_name as hf_model_name
+
+    # Prompts from concurrent calls are batched into one local generate();
+    # the ChatOllama below only gives the chains their prompt/parser halves
+    llm_pool = HFBackendPool()
+    llm = _make_llm(OLLAMA_BASE_URLS[0])
+    ACTIVE_MODEL_NAME = hf_model_name()
+else:
+    # One ChatOllama per backend in OLLAMA_BASE_URLS; calls go to the least-loaded
+    llm_pool = BackendPool(OLLAMA_BASE_URLS, _make_llm)
+    llm = llm_pool.backends[0].llm
+    ACTIVE_MODEL_NAME = LLM_MODEL_NAME
+
+# Deadlines, retries, hedging and circuit breaking for every LLM call.
+# Ollama calls lease a backend slot before their deadline starts; local
+# generation gets a deadline sized for whole CPU batches.
+if SUMMARIZER_BACKEND == "hf":
+    llm_caller = ResilientCaller(SUMMARIZER_BACKEND, timeout=HF_CALL_TIMEOUT)
+else:
+    llm_caller = ResilientCaller(SUMMARIZER_BACKEND, slots=llm_pool)
+
+_tokenizer = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count used for chunk packing and reduce budgeting.
+    Uses SUMMARY_TOKENIZER when configured, otherwise a chars/4 estimate.
+    """
+    global _tokenizer
+    if SUMMARY_TOKENIZER:
+        if _tokenizer is None:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(SUMMARY_TOKENIZER)
+        return len(_tokenizer.encode(text, add_special_tokens=False))
+    return (len(text) + 3) // 4
 
 # -----------------------------------------------------------------------------
 # 1. CLAUSE SUMMARIZATION PROMPTS (Micro-Level)
@@ -44,6 +110,29 @@ Summary:
 clause_prompt = PromptTemplate.from_template(clause_template)
 clause_chain = clause_prompt | llm | StrOutputParser()
 
+# BATCHED VARIANT: Several clauses per call, answered as JSON keyed by clause number
+clause_batch_template = """
+You are an expert legal analyst. Summarize EACH of the TARGET CLAUSES below.
+
+CONTEXT:
+{rag_context}
+
+TARGET CLAUSES:
+{clauses_text}
+
+INSTRUCTIONS:
+1. One concise sentence per clause capturing the obligation/right.
+2. Use the context, each clause's PREV/NEXT neighbours and the other clauses to clarify defined terms.
+3. Respond ONLY with a JSON array, one object per clause, in this exact shape:
+[{{"clause_no": <number>, "summary": "<one sentence>"}}]
+
+JSON:
+"""
+# Part of the "clause_batch" cache key; bump when the batched template changes
+CLAUSE_BATCH_TEMPLATE_ID = "clause-batch-v2"
+clause_batch_prompt = PromptTemplate.from_template(clause_batch_template)
+clause_batch_chain = clause_batch_prompt | llm | StrOutputParser()
+
 # -----------------------------------------------------------------------------
 # 2. GENERAL SUMMARIZATION PROMPTS (Macro-Level / Map-Reduce)
 # -----------------------------------------------------------------------------
@@ -78,6 +167,102 @@ Executive Summary:
 reduce_prompt = PromptTemplate.from_template(reduce_template)
 reduce_chain = reduce_prompt | llm | StrOutputParser()
 
+# COLLAPSE STEP: Merge a group of summaries when they do not fit one reduce call
+collapse_template = """
+Below are summaries of consecutive sections of a legal document.
+
+Merge them into one consolidated summary. Keep every key term, date, financial figure, party and obligation.
+
+SECTION SUMMARIES:
+{text}
+
+CONSOLIDATED SUMMARY:
+"""
+collapse_prompt = PromptTemplate.from_template(collapse_template)
+collapse_chain = collapse_prompt | llm | StrOutputParser()
+
+# -----------------------------------------------------------------------------
+# USAGE ACCOUNTING
+# -----------------------------------------------------------------------------
+# Per-job counters; tasks spawned by a job share its dict through the context
+_usage: contextvars.ContextVar = contextvars.ContextVar("llm_usage", default=None)
+
+
+def start_usage_tracking() -> Dict[str, int]:
+    """Start counting LLM calls/tokens for the current task and its children."""
+    usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    _usage.set(usage)
+    return usage
+
+
+async def _ainvoke(chain, inputs: dict) -> str:
+    """
+    Invoke a prompt | llm | parser chain on the configured backend through
+    the resilient caller, recording approximate token usage.
+    """
+    output = await llm_caller.call(lambda backend: llm_pool.ainvoke(chain, inputs, backend))
+    _record_usage(chain, inputs, output)
+    return output
+
+
+async def _astream(chain, inputs: dict, sink: Any) -> str:
+    """
+    Like _ainvoke, but forwards output chunks to `sink.write()` as they are
+    generated. If the call is retried, `sink.reset()` discards the partial text.
+    """
+    emitted = False
+
+    async def attempt(backend) -> str:
+        nonlocal emitted
+        if emitted:
+            sink.reset()
+        parts = []
+        async for chunk in llm_pool.astream(chain, inputs, backend):
+            parts.append(chunk)
+            sink.write(chunk)
+            emitted = True
+        return "".join(parts)
+
+    # No hedging: two concurrent attempts would interleave in the sink
+    output = await llm_caller.call(attempt, hedge=False)
+    _record_usage(chain, inputs, output)
+    return output
+
+
+def _record_usage(chain, inputs: dict, output: str):
+    usage = _usage.get()
+    if usage is not None:
+        usage["calls"] += 1
+        usage["prompt_tokens"] += count_tokens(chain.first.format(**inputs))
+        usage["completion_tokens"] += count_tokens(output or "")
+
+# -----------------------------------------------------------------------------
+# SUMMARY CACHE
+# -----------------------------------------------------------------------------
+# Outputs at temperature 0.1 are a deterministic-enough function of the inputs
+# and versions, so identical clauses/chunks are served from the cache.
+summary_cache: Optional[SummaryCache] = None
+
+
+def configure_cache(cache: Optional[SummaryCache]):
+    global summary_cache
+    summary_cache = cache
+
+
+def _cache_key(kind: str, *parts: str) -> str:
+    return make_key(kind, parts, (MODEL_VERSION, PROMPT_VERSION, ACTIVE_MODEL_NAME))
+
+
+async def _cache_get(kind: str, key: str) -> Optional[str]:
+    if summary_cache is None:
+        return None
+    return await summary_cache.get(kind, key)
+
+
+async def _cache_set(kind: str, key: str, value: str):
+    if summary_cache is not None and value:
+        await summary_cache.set(kind, key, value)
+
 # -----------------------------------------------------------------------------
 # FUNCTIONS
 # -----------------------------------------------------------------------------
@@ -85,15 +270,26 @@ async def generate_clause_summary(
     target_text: str, 
     prev_text: str = "", 
     next_text: str = "",
-    retriever: Optional[BaseRetriever] = None
+    retriever: Optional[BaseRetriever] = None,
+    related_docs: Optional[List[Document]] = None,
 ) -> Tuple[str, bool]:
     """
     Summarize specific extracted clauses (High precision).
+    `related_docs` (precomputed neighbours) replaces the retriever lookup.
+    Cached by (clause, neighbours, versions); RAG hits are not part of the key.
     """
     try:
+        cache_key = _cache_key("clause", target_text, prev_text, next_text)
+        cached = await _cache_get("clause", cache_key)
+        if cached is not None:
+            return cached, False
+
         rag_context = f"PREV: {prev_text}\nNEXT: {next_text}"
         
-        if retriever:
+        if related_docs is not None:
+            if related_docs:
+                rag_context += "\nRELATED:\n" + "\n".join([d.page_content[:200] for d in related_docs])
+        elif retriever:
             try:
                 # Use sync invoke if async not supported by specific retriever version
                 docs = await retriever.ainvoke(target_text)
@@ -105,16 +301,292 @@ async def generate_clause_summary(
             "target_text": target_text,
             "rag_context": rag_context,
         }
-        summary = await clause_chain.ainvoke(inputs)
+        summary = await _ainvoke(clause_chain, inputs)
+        await _cache_set("clause", cache_key, summary.strip())
         return summary.strip(), False
     except Exception as exc:
         print(f"Clause Error: {exc}")
         return "Summary unavailable.", True
 
-async def generate_general_summary_map_reduce(full_doc_text: str) -> str:
+def clauses_per_call() -> int:
+    """How many clauses one LLM call covers in the configured mode."""
+    return max(1, CLAUSES_PER_PROMPT) if CLAUSE_SUMMARY_MODE == "batched" else 1
+
+def _parse_batch_output(output: str, expected: List[int]) -> Dict[int, str]:
+    """
+    Pull {clause_no: summary} out of the model's JSON answer.
+    Entries for unexpected clause numbers or with empty summaries are dropped.
+    """
+    match = re.search(r"\[.*\]", output or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+
+    parsed = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            clause_no = int(item.get("clause_no"))
+        except (TypeError, ValueError):
+            continue
+        summary = item.get("summary")
+        if clause_no in expected and isinstance(summary, str) and summary.strip():
+            parsed[clause_no] = summary.strip()
+    return parsed
+
+def _batch_cache_key(item: dict) -> str:
+    """
+    Batched answers come from a different prompt than single-clause ones,
+    so they live under their own kind and never serve the other mode.
+    """
+    return _cache_key(
+        "clause_batch", CLAUSE_BATCH_TEMPLATE_ID,
+        item["target_text"], item.get("prev_text", ""), item.get("next_text", ""),
+    )
+
+def _batch_entry(items: List[dict], pos: int) -> str:
+    """
+    One clause of a batched prompt with its own PREV/NEXT neighbours.
+    Batches are not always consecutive (deduplicated, carried-forward and
+    cached clauses are taken out), so a neighbour is only omitted when it is
+    the adjacent clause of the batch itself.
+    """
+    item = items[pos]
+    lines = [f'[{item["clause_no"]}] "{item["target_text"]}"']
+    prev_text = item.get("prev_text", "")
+    if prev_text and (pos == 0 or items[pos - 1]["target_text"] != prev_text):
+        lines.append(f"PREV: {prev_text}")
+    next_text = item.get("next_text", "")
+    if next_text and (pos == len(items) - 1 or items[pos + 1]["target_text"] != next_text):
+        lines.append(f"NEXT: {next_text}")
+    return "\n".join(lines)
+
+def _merge_related(items: List[dict], limit: int = 3) -> List[Document]:
+    """
+    Round-robin the precomputed neighbours of a batch's clauses, skipping
+    repeats and clauses that are themselves in the batch.
+    """
+    targets = {item["target_text"] for item in items}
+    seen = set()
+    merged = []
+    lists = [item.get("related_docs") or [] for item in items]
+    for rank in range(max((len(docs) for docs in lists), default=0)):
+        for docs in lists:
+            if rank < len(docs):
+                doc = docs[rank]
+                if doc.page_content not in targets and doc.page_content not in seen:
+                    seen.add(doc.page_content)
+                    merged.append(doc)
+                    if len(merged) == limit:
+                        return merged
+    return merged
+
+async def _generate_clause_summary_batch(
+    items: List[dict], retriever: Optional[BaseRetriever] = None
+) -> List[Tuple[str, bool]]:
+    """
+    Summarize several clauses in one call. Clauses missing from (or invalid
+    in) the JSON answer fall back to a single-clause call each.
+    """
+    rag_context = "None"
+    if any(item.get("related_docs") is not None for item in items):
+        docs = _merge_related(items)
+        if docs:
+            rag_context = "RELATED:\n" + "\n".join([d.page_content[:200] for d in docs])
+    elif retriever:
+        try:
+            docs = await retriever.ainvoke(" ".join(item["target_text"] for item in items))
+            if docs:
+                rag_context = "RELATED:\n" + "\n".join([d.page_content[:200] for d in docs])
+        except Exception:
+            pass
+
+    clause_nos = [item["clause_no"] for item in items]
+    clauses_text = "\n\n".join(_batch_entry(items, pos) for pos in range(len(items)))
+    parsed = {}
+    try:
+        output = await _ainvoke(
+            clause_batch_chain,
+            {"rag_context": rag_context, "clauses_text": clauses_text},
+        )
+        parsed = _parse_batch_output(output, clause_nos)
+    except Exception as exc:
+        print(f"Clause Batch Error: {exc}")
+
+    for item in items:
+        if item["clause_no"] in parsed:
+            await _cache_set("clause_batch", _batch_cache_key(item), parsed[item["clause_no"]])
+
+    missing = [item for item in items if item["clause_no"] not in parsed]
+    if missing:
+        print(f"⚠️ Batched prompt missed {len(missing)}/{len(items)} clauses; falling back to single calls")
+    fallbacks = await asyncio.gather(
+        *[
+            generate_clause_summary(
+                item["target_text"], item.get("prev_text", ""), item.get("next_text", ""), retriever,
+                item.get("related_docs"),
+            )
+            for item in missing
+        ]
+    )
+    fallback_by_no = {item["clause_no"]: result for item, result in zip(missing, fallbacks)}
+
+    return [
+        (parsed[no], False) if no in parsed else fallback_by_no[no]
+        for no in clause_nos
+    ]
+
+async def generate_clause_summaries(
+    items: List[dict], retriever: Optional[BaseRetriever] = None
+) -> List[Tuple[str, bool]]:
+    """
+    Summarize a list of clauses, each given as
+    {"clause_no", "target_text", "prev_text", "next_text"} plus optional
+    "related_docs" (precomputed RAG neighbours).
+    Uses one call per clause or CLAUSES_PER_PROMPT clauses per call depending
+    on CLAUSE_SUMMARY_MODE; results are returned in input order.
+    """
+    if clauses_per_call() == 1:
+        return await asyncio.gather(
+            *[
+                generate_clause_summary(
+                    item["target_text"], item.get("prev_text", ""), item.get("next_text", ""), retriever,
+                    item.get("related_docs"),
+                )
+                for item in items
+            ]
+        )
+
+    # Serve cached clauses first so batches only carry real work
+    results: List[Optional[Tuple[str, bool]]] = []
+    for item in items:
+        cached = await _cache_get("clause_batch", _batch_cache_key(item))
+        results.append((cached, False) if cached is not None else None)
+    pending = [idx for idx, result in enumerate(results) if result is None]
+
+    size = clauses_per_call()
+    batches = [pending[i : i + size] for i in range(0, len(pending), size)]
+    batch_results = await asyncio.gather(
+        *[_generate_clause_summary_batch([items[idx] for idx in batch], retriever) for batch in batches]
+    )
+    for batch, batch_result in zip(batches, batch_results):
+        for idx, result in zip(batch, batch_result):
+            results[idx] = result
+    return results
+
+async def _summarize_texts(chain, texts: List[str], label: str = "chunk", kind: str = "map") -> List[Optional[str]]:
+    """
+    Run `chain` over every text with at most MAP_CONCURRENCY calls in flight.
+    Returns one entry per text, in order; None where the call failed,
+    timed out or came back empty.
+    """
+    semaphore = asyncio.Semaphore(max(1, MAP_CONCURRENCY))
+
+    async def summarize_chunk(idx: int, text: str) -> Optional[str]:
+        async with semaphore:
+            try:
+                cache_key = _cache_key(kind, text)
+                cached = await _cache_get(kind, cache_key)
+                if cached is not None:
+                    return cached
+                print(f"  📝 Summarizing {label} {idx + 1}/{len(texts)}...")
+                call = _ainvoke(chain, {"text": text})
+                if MAP_CHUNK_TIMEOUT > 0:
+                    summary = await asyncio.wait_for(call, timeout=MAP_CHUNK_TIMEOUT)
+                else:
+                    summary = await call
+                if summary and summary.strip():
+                    await _cache_set(kind, cache_key, summary.strip())
+                    return summary.strip()
+                print(f"  ⚠️ {label.capitalize()} {idx + 1} returned empty summary")
+            except asyncio.TimeoutError:
+                print(f"  ❌ {label.capitalize()} {idx + 1} timed out after {MAP_CHUNK_TIMEOUT}s")
+            except Exception as chunk_error:
+                print(f"  ❌ Error summarizing {label} {idx + 1}: {chunk_error}")
+                import traceback
+                traceback.print_exc()
+            # Continue with other chunks even if one fails
+            return None
+
+    return await asyncio.gather(
+        *[summarize_chunk(idx, text) for idx, text in enumerate(texts)]
+    )
+
+async def _map_chunks(chunks: List[str]) -> List[Optional[str]]:
+    return await _summarize_texts(map_chain, chunks, "chunk", "map")
+
+def split_by_tokens(text: str) -> List[str]:
+    """
+    Pack the document into chunks of up to MAP_CHUNK_TOKENS tokens,
+    splitting on paragraph, line, sentence and word boundaries in that order.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=MAP_CHUNK_TOKENS,
+        chunk_overlap=MAP_CHUNK_OVERLAP_TOKENS,
+        length_function=count_tokens,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return text_splitter.split_text(text)
+
+def _group_by_budget(summaries: List[str], budget: int) -> List[List[str]]:
+    """
+    Greedily pack consecutive summaries into groups of at most `budget` tokens.
+    Every group holds at least two summaries (when available) so that each
+    collapse round is guaranteed to shrink the list.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if current and current_tokens + tokens > budget and len(current) >= 2:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
+
+async def _collapse_summaries(summaries: List[str]) -> List[str]:
+    """
+    Hierarchically merge summaries in groups until together they fit
+    REDUCE_TOKEN_BUDGET, so the final reduce never overflows the context.
+    """
+    level = 0
+    while len(summaries) > 1 and sum(count_tokens(s) for s in summaries) > REDUCE_TOKEN_BUDGET:
+        level += 1
+        groups = _group_by_budget(summaries, REDUCE_TOKEN_BUDGET)
+        print(f"🔄 Collapse level {level}: {len(summaries)} summaries -> {len(groups)} groups")
+        collapsed = await _summarize_texts(
+            collapse_chain, ["\n\n".join(group) for group in groups], "group", "collapse"
+        )
+        # Keep the originals of any group whose collapse failed
+        next_summaries = []
+        for group, merged in zip(groups, collapsed):
+            next_summaries.extend([merged] if merged else group)
+        if len(next_summaries) >= len(summaries):
+            print("⚠️ Collapse made no progress; reducing what we have")
+            break
+        summaries = next_summaries
+    return summaries
+
+async def generate_general_summary_map_reduce(
+    full_doc_text: str, fallback_summary: Optional[str] = None, token_sink: Any = None
+) -> str:
     """
     Splits the FULL document text into chunks, summarizes each, 
     and then aggregates them into an Executive Summary.
+    If the LLM steps fail, `fallback_summary` (e.g. an extractive summary)
+    is returned instead of an error message when provided.
+    With a `token_sink` (write/reset), the reduce step streams its tokens to it.
     """
     if not full_doc_text:
         print("⚠️ No text available for general summarization")
@@ -125,55 +597,49 @@ async def generate_general_summary_map_reduce(full_doc_text: str) -> str:
         return "Document text is too short to generate a meaningful summary."
     
     try:
-        # 1. Split text into chunks (Llama 3 has 8k context, so 4k chunks are safe)
+        # 1. Split text into chunks packed up to MAP_CHUNK_TOKENS
         print(f"📄 Starting Map-Reduce summarization. Document length: {len(full_doc_text)} characters")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        docs = text_splitter.create_documents([full_doc_text])
-        print(f"📄 Split document into {len(docs)} chunks for general summarization.")
+        chunks = split_by_tokens(full_doc_text)
+        print(f"📄 Split document into {len(chunks)} chunks (≤{MAP_CHUNK_TOKENS} tokens) for general summarization.")
 
-        if not docs or len(docs) == 0:
+        if not chunks:
             print("⚠️ No chunks created from document")
             return "Unable to split document into processable chunks."
 
-        # 2. MAP: Summarize each chunk
-        chunk_summaries = []
-        for idx, doc in enumerate(docs):
-            try:
-                print(f"  📝 Summarizing chunk {idx + 1}/{len(docs)}...")
-                summary = await map_chain.ainvoke({"text": doc.page_content})
-                if summary and summary.strip():
-                    chunk_summaries.append(summary.strip())
-                else:
-                    print(f"  ⚠️ Chunk {idx + 1} returned empty summary")
-            except Exception as chunk_error:
-                print(f"  ❌ Error summarizing chunk {idx + 1}: {chunk_error}")
-                import traceback
-                traceback.print_exc()
-                # Continue with other chunks even if one fails
+        # 2. MAP: Summarize chunks concurrently (bounded), keeping document order
+        chunk_results = await _map_chunks(chunks)
+        chunk_summaries = [summary for summary in chunk_results if summary]
 
         if not chunk_summaries:
             print("❌ No chunk summaries generated")
-            return "Failed to generate summaries for document chunks."
+            return fallback_summary or "Failed to generate summaries for document chunks."
 
         print(f"✅ Generated {len(chunk_summaries)} chunk summaries")
 
-        # 3. REDUCE: Combine summaries
+        # 3. COLLAPSE: Merge summaries in groups until they fit one reduce call
+        chunk_summaries = await _collapse_summaries(chunk_summaries)
+
+        # 4. REDUCE: Combine summaries
         combined_text = "\n\n".join(chunk_summaries)
         print(f"🔄 Combining {len(chunk_summaries)} summaries into executive summary...")
-        final_summary = await reduce_chain.ainvoke({"text": combined_text})
+        reduce_key = _cache_key("reduce", combined_text)
+        final_summary = await _cache_get("reduce", reduce_key)
+        if final_summary is not None and token_sink is not None:
+            token_sink.write(final_summary)
+        elif final_summary is None and token_sink is not None:
+            final_summary = await _astream(reduce_chain, {"text": combined_text}, token_sink)
+        elif final_summary is None:
+            final_summary = await _ainvoke(reduce_chain, {"text": combined_text})
         
         if not final_summary or not final_summary.strip():
             print("⚠️ Reduce step returned empty summary")
-            return "Failed to generate final executive summary."
+            return fallback_summary or "Failed to generate final executive summary."
         
+        await _cache_set("reduce", reduce_key, final_summary.strip())
         print("✅ Executive summary generated successfully")
         return final_summary.strip()
     except Exception as exc:
         print(f"❌ General Summary Error: {exc}")
         import traceback
         traceback.print_exc()
-        return f"Executive summary unavailable due to processing error: {str(exc)}"
+        return fallback_summary or f"Executive summary unavailable due to processing error: {str(exc)}"